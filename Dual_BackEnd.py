@@ -2,44 +2,200 @@
 Data access layer for the blog application.
 Can work with both MongoDB and Cassandra backends.
 """
-from datetime import datetime
+from datetime import datetime, timezone
+from operator import itemgetter
 import os
+import threading
 
 # Determine which database to use
 USE_CASSANDRA = os.environ.get('USE_CASSANDRA', 'false').lower() == 'true'
 
 if USE_CASSANDRA:
     # Cassandra imports
-    from cassandra.cluster import Cluster
-    from cassandra.query import SimpleStatement
+    from cassandra import ConsistencyLevel
+    from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+    from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+    from cassandra.query import dict_factory
     
     # Cassandra configuration
     CASS_CONTACT_POINTS = os.environ.get('CASS_CONTACT_POINTS', '127.0.0.1').split(',')
     CASS_PORT = int(os.environ.get('CASS_PORT', 9042))
     CASS_KEYSPACE = os.environ.get('CASS_KEYSPACE', 'blog_data')
     
-    # Initialize Cassandra connection
-    cluster = Cluster(CASS_CONTACT_POINTS, port=CASS_PORT)
-    session = cluster.connect(CASS_KEYSPACE)
-    
-    print(f"Using Cassandra backend (keyspace: {CASS_KEYSPACE})")
+    # Number of token ranges scanned in parallel when reading all posts
+    READ_CONCURRENCY = int(os.environ.get('READ_CONCURRENCY', 8))
+    if READ_CONCURRENCY <= 0:
+        raise ValueError(f"READ_CONCURRENCY must be greater than 0, got {READ_CONCURRENCY}")
+    READ_FETCH_SIZE = 500
     
+    # All posts share one posts_by_date partition, which stays small for a blog
+    POSTS_BY_DATE_BUCKET = 0
+
 else:
     # MongoDB imports
-    from pymongo import MongoClient
+    from pymongo import MongoClient, ReturnDocument
     
     # MongoDB configuration
     MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/')
     MONGO_DB_NAME = os.environ.get('MONGO_DB', 'blog_database')
     
-    # Initialize MongoDB connection
-    client = MongoClient(MONGODB_URI)
+    # Case-insensitive ordering for title sorts; the title index uses the same
+    TITLE_COLLATION = {'locale': 'en', 'strength': 2}
+
+
+# ============================================================================
+# Connection Setup
+# ============================================================================
+
+# Opened per process on first use (or from gunicorn's post_fork hook) so
+# that forked workers never inherit the parent's sockets
+cluster = None
+session = None
+client = None
+db = None
+posts_collection = None
+counters_collection = None
+
+_connections_lock = threading.Lock()
+_connections_ready = False
+
+
+def _connect_cassandra():
+    """Connect to Cassandra, add missing tables/columns and prepare statements."""
+    global cluster, session
+    global _INSERT_POST_STMT, _INSERT_POST_BY_DATE_STMT, _SELECT_ALL_STMT
+    global _SELECT_NEXT_ID_STMT, _SEED_NEXT_ID_STMT, _CAS_NEXT_ID_STMT
+    global _INCR_AUTHOR_COUNT_STMT, _SELECT_AUTHOR_COUNTS_STMT
+    cluster = Cluster(
+        CASS_CONTACT_POINTS,
+        port=CASS_PORT,
+        protocol_version=4,
+        execution_profiles={
+            EXEC_PROFILE_DEFAULT: ExecutionProfile(
+                load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()),
+                request_timeout=10,
+                # Rows come back as dicts built by the driver
+                row_factory=dict_factory
+            )
+        }
+    )
+    session = cluster.connect(CASS_KEYSPACE)
+    session.default_fetch_size = 1000
+    
+    # Tables created before title_lower existed need the column added
+    if 'title_lower' not in cluster.metadata.keyspaces[CASS_KEYSPACE].tables['posts'].columns:
+        session.execute("ALTER TABLE posts ADD title_lower text")
+    
+    # Next unreserved post ID. A regular column rather than a counter, so
+    # blocks can be claimed with a compare-and-set
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS id_allocator (
+            name text PRIMARY KEY,
+            next_id int
+        )
+    """)
+    
+    # Per-author post counts, maintained on insert
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS author_counts (
+            author text PRIMARY KEY,
+            count counter
+        )
+    """)
+    
+    # Posts clustered newest-first; the other data layers stream
+    # date-sorted reads from this table
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS posts_by_date (
+            bucket int,
+            date timestamp,
+            id int,
+            title text,
+            content text,
+            author text,
+            PRIMARY KEY (bucket, date, id)
+        ) WITH CLUSTERING ORDER BY (date DESC, id DESC)
+    """)
+    
+    # Prepare hot-path statements once instead of on every call
+    _INSERT_POST_STMT = session.prepare(
+        "INSERT INTO posts (id, title, title_lower, content, author, date) "
+        "VALUES (?, ?, ?, ?, ?, ?)"
+    )
+    _INSERT_POST_STMT.consistency_level = ConsistencyLevel.LOCAL_QUORUM
+    
+    _INSERT_POST_BY_DATE_STMT = session.prepare(
+        "INSERT INTO posts_by_date (bucket, date, id, title, content, author) "
+        "VALUES (?, ?, ?, ?, ?, ?)"
+    )
+    _INSERT_POST_BY_DATE_STMT.consistency_level = ConsistencyLevel.LOCAL_QUORUM
+    
+    _SELECT_ALL_STMT = session.prepare(
+        "SELECT id, title, title_lower, content, author, date AS \"Date\" FROM posts "
+        "WHERE token(id) > ? AND token(id) <= ?"
+    )
+    _SELECT_ALL_STMT.fetch_size = READ_FETCH_SIZE
+    
+    _SELECT_NEXT_ID_STMT = session.prepare(
+        "SELECT next_id FROM id_allocator WHERE name = 'post_id'"
+    )
+    _SEED_NEXT_ID_STMT = session.prepare(
+        "INSERT INTO id_allocator (name, next_id) VALUES ('post_id', ?) IF NOT EXISTS"
+    )
+    _CAS_NEXT_ID_STMT = session.prepare(
+        "UPDATE id_allocator SET next_id = ? WHERE name = 'post_id' IF next_id = ?"
+    )
+    _INCR_AUTHOR_COUNT_STMT = session.prepare(
+        "UPDATE author_counts SET count = count + 1 WHERE author = ?"
+    )
+    _SELECT_AUTHOR_COUNTS_STMT = session.prepare(
+        "SELECT author, count FROM author_counts"
+    )
+    
+    print(f"Using Cassandra backend (keyspace: {CASS_KEYSPACE})")
+
+
+def _connect_mongo():
+    """Open the MongoDB client and make sure the indexes exist."""
+    global client, db, posts_collection, counters_collection
+    client = MongoClient(
+        MONGODB_URI,
+        maxPoolSize=50,
+        minPoolSize=10,
+        maxIdleTimeMS=60000,
+        waitQueueTimeoutMS=5000
+    )
     db = client[MONGO_DB_NAME]
     posts_collection = db['posts']
+    counters_collection = db['counters']
+    
+    # Index the fields used for ID lookups, aggregation and sorting
+    posts_collection.create_index([('id', -1)])
+    posts_collection.create_index([('author', 1)])
+    posts_collection.create_index([('Date', -1)])
+    posts_collection.create_index([('title', 1)], collation=TITLE_COLLATION)
     
     print(f"Using MongoDB backend (database: {MONGO_DB_NAME})")
 
 
+def _init_connections():
+    """Open this process's backend connection; later calls return immediately."""
+    global _connections_ready
+    if _connections_ready:
+        return
+    
+    with _connections_lock:
+        if _connections_ready:
+            return
+        if USE_CASSANDRA:
+            _connect_cassandra()
+            _sync_post_id_counter_cassandra()
+        else:
+            _connect_mongo()
+            _sync_post_id_counter_mongo()
+        _connections_ready = True
+
+
 def get_posts(sort_by="date"):
     """
     Retrieve all posts, sorted by date (newest first) or title (A-Z).
@@ -50,6 +206,7 @@ def get_posts(sort_by="date"):
     Returns:
         List of post dictionaries
     """
+    _init_connections()
     if USE_CASSANDRA:
         return _get_posts_cassandra(sort_by)
     else:
@@ -66,6 +223,7 @@ def add_post(new_data):
     Returns:
         Dictionary representing the created post
     """
+    _init_connections()
     if USE_CASSANDRA:
         return _add_post_cassandra(new_data)
     else:
@@ -79,6 +237,7 @@ def get_user_post_counts():
     Returns:
         List of dictionaries with 'author' and 'count' keys
     """
+    _init_connections()
     if USE_CASSANDRA:
         return _get_user_post_counts_cassandra()
     else:
@@ -91,19 +250,42 @@ def get_user_post_counts():
 
 def _get_posts_mongo(sort_by="date"):
     """Get posts from MongoDB."""
-    all_posts = list(posts_collection.find({}, {'_id': 0}))
-    
+    # Let the server sort using the Date/title indexes
+    # Posts written by older versions may still carry a title_lower field
+    cursor = posts_collection.find({}, {'_id': 0, 'title_lower': 0})
     if sort_by == "title":
-        return sorted(all_posts, key=lambda x: x.get('title', '').lower())
+        cursor = cursor.sort('title', 1).collation(TITLE_COLLATION)
     else:
-        return sorted(all_posts, key=lambda x: x.get('Date', datetime.min), reverse=True)
+        cursor = cursor.sort('Date', -1)
+    return list(cursor)
+
+
+def _sync_post_id_counter_mongo():
+    """
+    Move the post_id counter up to the highest post ID in MongoDB.
+    
+    Covers posts inserted without going through the counter, such as the
+    sample data from insert_data.py. The lookup is served by the id index.
+    """
+    last_post = posts_collection.find_one(sort=[("id", -1)])
+    if last_post:
+        counters_collection.update_one(
+            {'_id': 'post_id'},
+            {'$max': {'seq': last_post['id']}},
+            upsert=True
+        )
 
 
 def _add_post_mongo(new_data):
     """Add post to MongoDB."""
-    new_data['Date'] = datetime.now()
-    last_post = posts_collection.find_one(sort=[("id", -1)])
-    new_data['id'] = (last_post['id'] + 1) if last_post else 1
+    new_data['Date'] = datetime.now(timezone.utc)
+    counter = counters_collection.find_one_and_update(
+        {'_id': 'post_id'},
+        {'$inc': {'seq': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    new_data['id'] = counter['seq']
     
     if 'author' not in new_data or not new_data['author']:
         new_data['author'] = "Anonymous"
@@ -113,7 +295,6 @@ def _add_post_mongo(new_data):
     response_data = new_data.copy()
     if '_id' in response_data:
         del response_data['_id']
-    response_data['Date'] = response_data['Date'].strftime("%Y-%m-%d %H:%M:%S")
     return response_data
 
 
@@ -130,66 +311,192 @@ def _get_user_post_counts_mongo():
 # Cassandra Implementation
 # ============================================================================
 
+# Murmur3Partitioner token bounds
+_MIN_TOKEN = -2 ** 63
+_MAX_TOKEN = 2 ** 63 - 1
+
+
+def _token_ranges(count):
+    """Split the token ring into `count` contiguous (start, end] ranges."""
+    step = (_MAX_TOKEN - _MIN_TOKEN) // count
+    bounds = [_MIN_TOKEN + i * step for i in range(count)] + [_MAX_TOKEN]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _scan_token_ranges(session, stmt, count, **kwargs):
+    """
+    Return every row `stmt` reads over `count` token ranges.
+    
+    Each range is paged from the driver's callbacks: the next page is
+    requested as soon as the previous one arrives, so the pages of all
+    ranges are fetched side by side rather than one after another.
+    """
+    ranges = _token_ranges(count)
+    rows = []
+    errors = []
+    remaining = [len(ranges)]
+    lock = threading.Lock()
+    done = threading.Event()
+    
+    def finish(exc=None):
+        with lock:
+            if exc is not None:
+                errors.append(exc)
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done.set()
+    
+    def scan(token_range):
+        future = session.execute_async(stmt, token_range, **kwargs)
+        
+        def on_page(page):
+            with lock:
+                rows.extend(page)
+            if future.has_more_pages:
+                future.start_fetching_next_page()
+            else:
+                finish()
+        
+        future.add_callbacks(callback=on_page, errback=finish)
+    
+    for token_range in ranges:
+        scan(token_range)
+    done.wait()
+    
+    if errors:
+        raise errors[0]
+    return rows
+
+
 def _get_posts_cassandra(sort_by="date"):
     """Get posts from Cassandra."""
-    query = "SELECT id, title, content, author, date FROM posts"
-    rows = session.execute(query)
-    
-    all_posts = []
-    for row in rows:
-        post = {
-            'id': row.id,
-            'title': row.title,
-            'content': row.content,
-            'author': row.author,
-            'Date': row.date.strftime("%Y-%m-%d %H:%M:%S") if row.date else ""
-        }
-        all_posts.append(post)
+    # Scan the table as token ranges whose pages are fetched in parallel;
+    # rows already come back as response-shaped dicts
+    all_posts = _scan_token_ranges(session, _SELECT_ALL_STMT, READ_CONCURRENCY)
     
-    # Sort posts
     if sort_by == "title":
-        return sorted(all_posts, key=lambda x: x.get('title', '').lower())
+        # Rows written before title_lower existed fall back to lower()
+        for post in all_posts:
+            if post['title_lower'] is None:
+                post['title_lower'] = str(post['title'] or '').lower()
+        all_posts.sort(key=itemgetter('title_lower'))
     else:
-        # Sort by date (parse back to datetime for sorting)
-        return sorted(
-            all_posts,
-            key=lambda x: datetime.strptime(x['Date'], "%Y-%m-%d %H:%M:%S") if x['Date'] else datetime.min,
-            reverse=True
-        )
+        all_posts.sort(key=_date_sort_key, reverse=True)
+    
+    for post in all_posts:
+        del post['title_lower']
+    return all_posts
+
+
+def _date_sort_key(post):
+    """Sort key for newest-first ordering; undated posts go last."""
+    return post['Date'] or datetime.min
+
+
+# Post IDs are reserved from id_allocator in blocks; see _next_post_id_cassandra()
+ID_BLOCK_SIZE = int(os.environ.get('ID_BLOCK_SIZE', 20))
+_id_block_lock = threading.Lock()
+_id_block_next = 1
+_id_block_end = 0
+
+
+def _next_post_id_cassandra():
+    """
+    Return the next post ID, reserving a fresh block of ID_BLOCK_SIZE IDs
+    from id_allocator once the current one is used up.
+    """
+    global _id_block_next, _id_block_end
+    with _id_block_lock:
+        if _id_block_next > _id_block_end:
+            _id_block_next = _reserve_id_block_cassandra()
+            _id_block_end = _id_block_next + ID_BLOCK_SIZE - 1
+        next_id = _id_block_next
+        _id_block_next += 1
+        return next_id
+
+
+def _sync_post_id_counter_cassandra():
+    """
+    Move the post ID allocator past the highest post ID in Cassandra.
+    
+    Posts copied by the migration tools keep their MongoDB IDs, so the
+    allocator can lag behind the table. This scans the table once at
+    startup instead of on every insert, and only ever moves it forward.
+    """
+    row = session.execute("SELECT MAX(id) as max_id FROM posts").one()
+    max_id = row['max_id'] if row and row['max_id'] is not None else 0
+    
+    result = session.execute(_SEED_NEXT_ID_STMT, (max_id + 1,))
+    if result.was_applied:
+        return
+    current = result.one()['next_id']
+    while current <= max_id:
+        result = session.execute(_CAS_NEXT_ID_STMT, (max_id + 1, current))
+        if result.was_applied:
+            return
+        current = result.one()['next_id']
+
+
+def _reserve_id_block_cassandra():
+    """
+    Claim the next ID_BLOCK_SIZE post IDs and return the first of them.
+    
+    The claim is a lightweight transaction, so two processes can never be
+    handed the same block; a lost race just retries from the value that won.
+    """
+    row = session.execute(_SELECT_NEXT_ID_STMT).one()
+    if row is None:
+        _sync_post_id_counter_cassandra()
+        row = session.execute(_SELECT_NEXT_ID_STMT).one()
+    
+    current = row['next_id']
+    while True:
+        result = session.execute(_CAS_NEXT_ID_STMT, (current + ID_BLOCK_SIZE, current))
+        if result.was_applied:
+            return current
+        current = result.one()['next_id']
 
 
 def _add_post_cassandra(new_data):
     """Add post to Cassandra."""
-    # Get the next ID
-    max_id_query = "SELECT MAX(id) as max_id FROM posts"
-    result = session.execute(max_id_query)
-    row = result.one()
-    next_id = (row.max_id + 1) if row and row.max_id is not None else 1
+    next_id = _next_post_id_cassandra()
     
     # Set defaults
-    current_time = datetime.now()
+    current_time = datetime.now(timezone.utc)
     new_data['id'] = next_id
     new_data['Date'] = current_time
     
     if 'author' not in new_data or not new_data['author']:
         new_data['author'] = "Anonymous"
     
-    # Insert into Cassandra
-    insert_query = """
-        INSERT INTO posts (id, title, content, author, date)
-        VALUES (?, ?, ?, ?, ?)
-    """
-    prepared = session.prepare(insert_query)
-    session.execute(
-        prepared,
-        (
-            new_data['id'],
-            new_data['title'],
-            new_data['content'],
-            new_data['author'],
-            current_time
-        )
-    )
+    # Insert into Cassandra; the three writes are independent, so send them together
+    futures = [
+        session.execute_async(
+            _INSERT_POST_STMT,
+            (
+                new_data['id'],
+                new_data['title'],
+                str(new_data['title'] or '').lower(),
+                new_data['content'],
+                new_data['author'],
+                current_time
+            )
+        ),
+        session.execute_async(
+            _INSERT_POST_BY_DATE_STMT,
+            (
+                POSTS_BY_DATE_BUCKET,
+                current_time,
+                new_data['id'],
+                new_data['title'],
+                new_data['content'],
+                new_data['author']
+            )
+        ),
+        session.execute_async(_INCR_AUTHOR_COUNT_STMT, (new_data['author'],))
+    ]
+    for future in futures:
+        future.result()
     
     # Return response
     response_data = {
@@ -197,25 +504,13 @@ def _add_post_cassandra(new_data):
         'title': new_data['title'],
         'content': new_data['content'],
         'author': new_data['author'],
-        'Date': current_time.strftime("%Y-%m-%d %H:%M:%S")
+        'Date': current_time
     }
     return response_data
 
 
 def _get_user_post_counts_cassandra():
     """Get user post counts from Cassandra."""
-    # Cassandra doesn't have aggregation like MongoDB, so we need to do it in Python
-    query = "SELECT author FROM posts"
-    rows = session.execute(query)
-    
-    # Count posts per author
-    author_counts = {}
-    for row in rows:
-        author = row.author or "Anonymous"
-        author_counts[author] = author_counts.get(author, 0) + 1
-    
-    # Convert to list format
-    return [
-        {'author': author, 'count': count}
-        for author, count in author_counts.items()
-    ]
\ No newline at end of file
+    # Counts are maintained per insert in the author_counts counter table
+    return list(session.execute(_SELECT_AUTHOR_COUNTS_STMT))
+
@@ -10,10 +10,42 @@ This Flask application supports a phased migration strategy:
 Set MIGRATION_PHASE environment variable to control the phase.
 """
 
-from flask import Flask, render_template, jsonify, request
+import signal
+import sys
+
+import orjson
+from flask import Flask, Response, render_template, jsonify, request, stream_with_context
+from flask.json.provider import JSONProvider
 import data_migration as data
 
+
+class OrjsonProvider(JSONProvider):
+    """
+    JSON provider backed by orjson.
+    
+    orjson serializes datetime objects natively, so the data layer can
+    return post dates as-is. Naive datetimes from the databases are UTC.
+    """
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+
+def _json_array(items):
+    """Encode an iterable of objects as a JSON array, one item at a time."""
+    yield b'['
+    for i, item in enumerate(items):
+        if i:
+            yield b','
+        yield orjson.dumps(item, option=orjson.OPT_NAIVE_UTC)
+    yield b']'
 
 
 @app.route('/')
@@ -31,6 +63,12 @@ def get_posts():
     - sort: 'date' (default, newest first) or 'title' (alphabetical A-Z)
     """
     sort_type = request.args.get('sort', 'date')
+    
+    # Stream rows as they are paged in when the data layer supports it
+    stream = data.stream_posts(sort_by=sort_type)
+    if stream is not None:
+        return Response(stream_with_context(_json_array(stream)), mimetype='application/json')
+    
     posts = data.get_posts(sort_by=sort_type)
     return jsonify(posts)
 
@@ -64,6 +102,12 @@ def migration_status():
     return jsonify(data.get_migration_status())
 
 
+@app.route('/api/migration/lag', methods=['GET'])
+def migration_lag():
+    """Get the number of dual-written posts not yet replicated to Cassandra."""
+    return jsonify({'replication_lag': data.get_replication_lag()})
+
+
 if __name__ == '__main__':
     print("\n" + "=" * 60)
     print("Blog Application Starting")
@@ -73,4 +117,6 @@ if __name__ == '__main__':
     print(f"MongoDB Connected: {status['mongodb_connected']}")
     print(f"Cassandra Connected: {status['cassandra_connected']}")
     print("=" * 60 + "\n")
+    # Exit cleanly on SIGTERM so pending Cassandra replication is drained
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     app.run(debug=True)
\ No newline at end of file
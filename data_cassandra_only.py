@@ -6,14 +6,19 @@ Use this file after successfully completing the migration and cleanup.
 
 To switch to this file:
 1. Complete migration and verify data in Cassandra
-2. Run: mv data_cassandra_only.py data.py
+2. Run: mv data_cassandra_only.py data_migration.py
 3. Remove MongoDB dependencies from requirements.txt
 """
 
 import os
-from datetime import datetime
-from cassandra.cluster import Cluster
-from cassandra.query import SimpleStatement
+import threading
+from datetime import datetime, timezone
+from operator import itemgetter
+from cassandra import ConsistencyLevel
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+from cassandra.query import dict_factory
+from cachetools.func import ttl_cache
 
 
 # Cassandra configuration
@@ -21,28 +26,220 @@ CASS_CONTACT_POINTS = os.environ.get('CASS_CONTACT_POINTS', '127.0.0.1').split('
 CASS_PORT = int(os.environ.get('CASS_PORT', 9042))
 CASS_KEYSPACE = os.environ.get('CASS_KEYSPACE', 'blog_data')
 
-# Initialize Cassandra connection
-cluster = Cluster(CASS_CONTACT_POINTS, port=CASS_PORT)
-session = cluster.connect()
-
-# Ensure keyspace and table exist
-session.execute(f"""
-    CREATE KEYSPACE IF NOT EXISTS {CASS_KEYSPACE}
-    WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}
-""")
-session.set_keyspace(CASS_KEYSPACE)
-
-session.execute("""
-    CREATE TABLE IF NOT EXISTS posts (
-        id int PRIMARY KEY,
-        title text,
-        content text,
-        author text,
-        date timestamp
+# All posts share one posts_by_date partition, which stays small for a blog
+POSTS_BY_DATE_BUCKET = 0
+
+cluster = None
+session = None
+
+
+def _connect_cassandra():
+    """Connect to Cassandra, create the schema and prepare statements."""
+    global cluster, session
+    global _INSERT_POST_STMT, _INSERT_POST_BY_DATE_STMT, _SELECT_BY_DATE_STMT
+    global _SELECT_NEXT_ID_STMT, _SEED_NEXT_ID_STMT, _CAS_NEXT_ID_STMT
+    global _INCR_AUTHOR_COUNT_STMT, _SELECT_AUTHOR_COUNTS_STMT
+    cluster = Cluster(
+        CASS_CONTACT_POINTS,
+        port=CASS_PORT,
+        protocol_version=4,
+        execution_profiles={
+            EXEC_PROFILE_DEFAULT: ExecutionProfile(
+                load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()),
+                request_timeout=10,
+                # Rows come back as dicts built by the driver
+                row_factory=dict_factory
+            )
+        }
+    )
+    session = cluster.connect()
+    session.default_fetch_size = 1000
+    
+    # Ensure keyspace and table exist
+    session.execute(f"""
+        CREATE KEYSPACE IF NOT EXISTS {CASS_KEYSPACE}
+        WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}
+    """)
+    session.set_keyspace(CASS_KEYSPACE)
+    
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS posts (
+            id int PRIMARY KEY,
+            title text,
+            title_lower text,
+            content text,
+            author text,
+            date timestamp
+        )
+    """)
+    
+    # Tables created before title_lower existed need the column added
+    if 'title_lower' not in cluster.metadata.keyspaces[CASS_KEYSPACE].tables['posts'].columns:
+        session.execute("ALTER TABLE posts ADD title_lower text")
+    
+    # Next unreserved post ID. A regular column rather than a counter, so
+    # blocks can be claimed with a compare-and-set
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS id_allocator (
+            name text PRIMARY KEY,
+            next_id int
+        )
+    """)
+    
+    # Per-author post counts, maintained on insert
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS author_counts (
+            author text PRIMARY KEY,
+            count counter
+        )
+    """)
+    
+    # Posts clustered newest-first so date-sorted reads can be streamed
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS posts_by_date (
+            bucket int,
+            date timestamp,
+            id int,
+            title text,
+            content text,
+            author text,
+            PRIMARY KEY (bucket, date, id)
+        ) WITH CLUSTERING ORDER BY (date DESC, id DESC)
+    """)
+    
+    # Prepare hot-path statements once instead of on every call
+    _INSERT_POST_STMT = session.prepare(
+        "INSERT INTO posts (id, title, title_lower, content, author, date) "
+        "VALUES (?, ?, ?, ?, ?, ?)"
+    )
+    _INSERT_POST_STMT.consistency_level = ConsistencyLevel.LOCAL_QUORUM
+    
+    _INSERT_POST_BY_DATE_STMT = session.prepare(
+        "INSERT INTO posts_by_date (bucket, date, id, title, content, author) "
+        "VALUES (?, ?, ?, ?, ?, ?)"
     )
-""")
+    _INSERT_POST_BY_DATE_STMT.consistency_level = ConsistencyLevel.LOCAL_QUORUM
+    
+    _SELECT_BY_DATE_STMT = session.prepare(
+        "SELECT id, title, content, author, date AS \"Date\" "
+        "FROM posts_by_date WHERE bucket = ?"
+    )
+    _SELECT_BY_DATE_STMT.fetch_size = 500
+    
+    _SELECT_NEXT_ID_STMT = session.prepare(
+        "SELECT next_id FROM id_allocator WHERE name = 'post_id'"
+    )
+    _SEED_NEXT_ID_STMT = session.prepare(
+        "INSERT INTO id_allocator (name, next_id) VALUES ('post_id', ?) IF NOT EXISTS"
+    )
+    _CAS_NEXT_ID_STMT = session.prepare(
+        "UPDATE id_allocator SET next_id = ? WHERE name = 'post_id' IF next_id = ?"
+    )
+    _INCR_AUTHOR_COUNT_STMT = session.prepare(
+        "UPDATE author_counts SET count = count + 1 WHERE author = ?"
+    )
+    _SELECT_AUTHOR_COUNTS_STMT = session.prepare(
+        "SELECT author, count FROM author_counts"
+    )
+    
+    print(f"[Cassandra] Connected to keyspace: {CASS_KEYSPACE}")
+
+
+# Post IDs are reserved from id_allocator in blocks; see _next_post_id()
+ID_BLOCK_SIZE = int(os.environ.get('ID_BLOCK_SIZE', 20))
+_id_block_lock = threading.Lock()
+_id_block_next = 1
+_id_block_end = 0
+
+
+def _sync_post_id_counter():
+    """
+    Move the post ID allocator past the highest post ID in the table.
+    
+    Posts copied by the migration tools keep their MongoDB IDs, so the
+    allocator can lag behind the table. This scans the table once at
+    startup instead of on every insert, and only ever moves it forward.
+    """
+    row = session.execute("SELECT MAX(id) as max_id FROM posts").one()
+    max_id = row['max_id'] if row and row['max_id'] is not None else 0
+    
+    result = session.execute(_SEED_NEXT_ID_STMT, (max_id + 1,))
+    if result.was_applied:
+        return
+    current = result.one()['next_id']
+    while current <= max_id:
+        result = session.execute(_CAS_NEXT_ID_STMT, (max_id + 1, current))
+        if result.was_applied:
+            return
+        current = result.one()['next_id']
+
 
-print(f"[Cassandra] Connected to keyspace: {CASS_KEYSPACE}")
+def _reserve_id_block():
+    """
+    Claim the next ID_BLOCK_SIZE post IDs and return the first of them.
+    
+    The claim is a lightweight transaction, so two processes can never be
+    handed the same block; a lost race just retries from the value that won.
+    """
+    row = session.execute(_SELECT_NEXT_ID_STMT).one()
+    if row is None:
+        _sync_post_id_counter()
+        row = session.execute(_SELECT_NEXT_ID_STMT).one()
+    
+    current = row['next_id']
+    while True:
+        result = session.execute(_CAS_NEXT_ID_STMT, (current + ID_BLOCK_SIZE, current))
+        if result.was_applied:
+            return current
+        current = result.one()['next_id']
+
+
+# Connections are opened on first use rather than at import, so a process
+# that forks after importing this module (gunicorn preload) doesn't share
+# sockets or the driver's IO thread with its workers
+_connections_lock = threading.Lock()
+_connections_ready = False
+
+
+def _init_connections():
+    """
+    Open the Cassandra connection for this process.
+    
+    Called from gunicorn's post_fork hook and lazily by every public
+    function; only the first call does any work.
+    """
+    global _connections_ready
+    if _connections_ready:
+        return
+    
+    with _connections_lock:
+        if _connections_ready:
+            return
+        _connect_cassandra()
+        _sync_post_id_counter()
+        _connections_ready = True
+
+
+def get_replication_lag():
+    """Return 0: writes go straight to Cassandra, so nothing is ever queued."""
+    return 0
+
+
+def drain_replication_queue(timeout=30):
+    """Return True; there is no replication queue to drain in this module."""
+    return True
+
+
+def _next_post_id():
+    """Return the next post ID, taking a new block from id_allocator when needed."""
+    global _id_block_next, _id_block_end
+    with _id_block_lock:
+        if _id_block_next > _id_block_end:
+            _id_block_next = _reserve_id_block()
+            _id_block_end = _id_block_next + ID_BLOCK_SIZE - 1
+        next_id = _id_block_next
+        _id_block_next += 1
+        return next_id
 
 
 def get_posts(sort_by="date"):
@@ -55,28 +252,39 @@ def get_posts(sort_by="date"):
     Returns:
         List of post dictionaries
     """
-    query = "SELECT id, title, content, author, date FROM posts"
-    rows = session.execute(query)
-    
-    all_posts = []
-    for row in rows:
-        post = {
-            'id': row.id,
-            'title': row.title,
-            'content': row.content,
-            'author': row.author,
-            'Date': row.date.strftime("%Y-%m-%d %H:%M:%S") if row.date else ""
-        }
-        all_posts.append(post)
+    _init_connections()
+    query = 'SELECT id, title, title_lower, content, author, date AS "Date" FROM posts'
+    all_posts = list(session.execute(query))
     
     if sort_by == "title":
-        return sorted(all_posts, key=lambda x: x.get('title', '').lower())
+        # Rows written before title_lower existed fall back to lower()
+        for post in all_posts:
+            if post['title_lower'] is None:
+                post['title_lower'] = str(post['title'] or '').lower()
+        all_posts.sort(key=itemgetter('title_lower'))
     else:
-        return sorted(
-            all_posts,
-            key=lambda x: x['Date'] if x['Date'] else '',
-            reverse=True
-        )
+        # Dates stay as datetime objects; undated posts sort last
+        all_posts.sort(key=lambda post: post['Date'] or datetime.min, reverse=True)
+    
+    for post in all_posts:
+        del post['title_lower']
+    return all_posts
+
+
+def stream_posts(sort_by="date"):
+    """
+    Return a generator of posts for streaming, or None if unsupported.
+    
+    Date-sorted reads come from the posts_by_date table, whose rows arrive
+    newest first, so only one page is held in memory at a time. Title
+    sorting needs the full list; use get_posts() when this returns None.
+    """
+    _init_connections()
+    if sort_by == "title":
+        return None
+    
+    # Rows already come back as response-shaped dicts
+    return iter(session.execute(_SELECT_BY_DATE_STMT, (POSTS_BY_DATE_BUCKET,)))
 
 
 def add_post(new_data):
@@ -89,34 +297,43 @@ def add_post(new_data):
     Returns:
         Dictionary representing the created post
     """
-    # Get the next ID
-    max_id_query = "SELECT MAX(id) as max_id FROM posts"
-    result = session.execute(max_id_query)
-    row = result.one()
-    next_id = (row.max_id + 1) if row and row.max_id is not None else 1
+    _init_connections()
+    next_id = _next_post_id()
     
     # Set defaults
-    current_time = datetime.now()
+    current_time = datetime.now(timezone.utc)
     
     if 'author' not in new_data or not new_data['author']:
         new_data['author'] = "Anonymous"
     
-    # Insert into Cassandra
-    insert_query = """
-        INSERT INTO posts (id, title, content, author, date)
-        VALUES (?, ?, ?, ?, ?)
-    """
-    prepared = session.prepare(insert_query)
-    session.execute(
-        prepared,
-        (
-            next_id,
-            new_data['title'],
-            new_data['content'],
-            new_data['author'],
-            current_time
-        )
-    )
+    # Insert into Cassandra; the three writes are independent, so send them together
+    futures = [
+        session.execute_async(
+            _INSERT_POST_STMT,
+            (
+                next_id,
+                new_data['title'],
+                str(new_data['title'] or '').lower(),
+                new_data['content'],
+                new_data['author'],
+                current_time
+            )
+        ),
+        session.execute_async(
+            _INSERT_POST_BY_DATE_STMT,
+            (
+                POSTS_BY_DATE_BUCKET,
+                current_time,
+                next_id,
+                new_data['title'],
+                new_data['content'],
+                new_data['author']
+            )
+        ),
+        session.execute_async(_INCR_AUTHOR_COUNT_STMT, (new_data['author'],))
+    ]
+    for future in futures:
+        future.result()
     
     # Return response
     return {
@@ -124,7 +341,7 @@ def add_post(new_data):
         'title': new_data['title'],
         'content': new_data['content'],
         'author': new_data['author'],
-        'Date': current_time.strftime("%Y-%m-%d %H:%M:%S")
+        'Date': current_time
     }
 
 
@@ -135,26 +352,22 @@ def get_user_post_counts():
     Returns:
         List of dictionaries with 'author' and 'count' keys
     """
-    query = "SELECT author FROM posts"
-    rows = session.execute(query)
-    
-    # Count posts per author
-    author_counts = {}
-    for row in rows:
-        author = row.author or "Anonymous"
-        author_counts[author] = author_counts.get(author, 0) + 1
-    
-    return [
-        {'author': author, 'count': count}
-        for author, count in author_counts.items()
-    ]
+    _init_connections()
+    # Counts are maintained per insert in the author_counts counter table
+    return list(session.execute(_SELECT_AUTHOR_COUNTS_STMT))
+
+
+@ttl_cache(maxsize=1, ttl=10)
+def _post_count():
+    """Count posts; COUNT(*) is a full scan, so status polls share it briefly."""
+    return session.execute("SELECT COUNT(*) FROM posts").one()['count']
 
 
 def get_migration_status():
     """Get Cassandra database status."""
     try:
-        result = session.execute("SELECT COUNT(*) FROM posts")
-        count = result.one()[0]
+        _init_connections()
+        count = _post_count()
         return {
             'phase': 'cassandra_only',
             'mongodb_connected': False,
@@ -10,9 +10,17 @@ This module provides a unified data access layer that supports 4 migration phase
 Set the MIGRATION_PHASE environment variable to control the phase.
 """
 
+import atexit
 import os
-from datetime import datetime
+import queue
+import threading
+import time
+from datetime import datetime, timezone
 from enum import Enum
+from operator import itemgetter
+
+from cachetools import TTLCache
+from cachetools.func import ttl_cache
 
 
 class MigrationPhase(Enum):
@@ -37,18 +45,41 @@ print(f"[Migration] Current phase: {MIGRATION_PHASE.value}")
 mongo_client = None
 mongo_db = None
 posts_collection = None
+counters_collection = None
+
+# Case-insensitive ordering for title sorts; the title index uses the same
+TITLE_COLLATION = {'locale': 'en', 'strength': 2}
 
 if MIGRATION_PHASE != MigrationPhase.CASSANDRA_ONLY:
-    from pymongo import MongoClient
+    from pymongo import MongoClient, ReturnDocument
     
     MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/')
     MONGO_DB_NAME = os.environ.get('MONGO_DB', 'blog_database')
-    
+
+
+def _connect_mongo():
+    """Open the MongoDB client and make sure the indexes exist."""
+    global mongo_client, mongo_db, posts_collection, counters_collection
     try:
-        mongo_client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+        mongo_client = MongoClient(
+            MONGODB_URI,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=50,
+            minPoolSize=10,
+            maxIdleTimeMS=60000,
+            waitQueueTimeoutMS=5000
+        )
         mongo_client.server_info()  # Test connection
         mongo_db = mongo_client[MONGO_DB_NAME]
         posts_collection = mongo_db['posts']
+        counters_collection = mongo_db['counters']
+        
+        # Index the fields used for ID lookups, aggregation and sorting
+        posts_collection.create_index([('id', -1)])
+        posts_collection.create_index([('author', 1)])
+        posts_collection.create_index([('Date', -1)])
+        posts_collection.create_index([('title', 1)], collation=TITLE_COLLATION)
+        
         print(f"[MongoDB] Connected to database: {MONGO_DB_NAME}")
     except Exception as e:
         print(f"[MongoDB] Connection failed: {e}")
@@ -64,15 +95,49 @@ cassandra_cluster = None
 cassandra_session = None
 
 if MIGRATION_PHASE != MigrationPhase.MONGO_ONLY:
-    from cassandra.cluster import Cluster
-    from cassandra.query import SimpleStatement
+    from cassandra import ConsistencyLevel
+    from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+    from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+    from cassandra.query import dict_factory
     
     CASS_CONTACT_POINTS = os.environ.get('CASS_CONTACT_POINTS', '127.0.0.1').split(',')
     CASS_PORT = int(os.environ.get('CASS_PORT', 9042))
     CASS_KEYSPACE = os.environ.get('CASS_KEYSPACE', 'blog_data')
     
+    # Number of token ranges scanned in parallel when reading all posts
+    READ_CONCURRENCY = int(os.environ.get('READ_CONCURRENCY', 8))
+    if READ_CONCURRENCY <= 0:
+        raise ValueError(f"READ_CONCURRENCY must be greater than 0, got {READ_CONCURRENCY}")
+    READ_FETCH_SIZE = 500
+    
+    # Execution profile for the post reads: the driver builds the row dicts
+    # itself, so they can be returned without copying them field by field
+    DICT_PROFILE = 'dict_rows'
+
+
+def _connect_cassandra():
+    """Connect to Cassandra, create the schema and prepare statements."""
+    global cassandra_cluster, cassandra_session
+    global _INSERT_POST_STMT, _SELECT_ALL_STMT, _INSERT_POST_BY_DATE_STMT, _SELECT_BY_DATE_STMT
+    global _INCR_AUTHOR_COUNT_STMT, _SELECT_AUTHOR_COUNTS_STMT, _COUNT_STMT
+    global _SELECT_NEXT_ID_STMT, _SEED_NEXT_ID_STMT, _CAS_NEXT_ID_STMT
     try:
-        cassandra_cluster = Cluster(CASS_CONTACT_POINTS, port=CASS_PORT)
+        cassandra_cluster = Cluster(
+            CASS_CONTACT_POINTS,
+            port=CASS_PORT,
+            protocol_version=4,
+            execution_profiles={
+                EXEC_PROFILE_DEFAULT: ExecutionProfile(
+                    load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()),
+                    request_timeout=10
+                ),
+                DICT_PROFILE: ExecutionProfile(
+                    load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy()),
+                    request_timeout=10,
+                    row_factory=dict_factory
+                )
+            }
+        )
         cassandra_session = cassandra_cluster.connect()
         
         # Ensure keyspace exists
@@ -87,12 +152,90 @@ if MIGRATION_PHASE != MigrationPhase.MONGO_ONLY:
             CREATE TABLE IF NOT EXISTS posts (
                 id int PRIMARY KEY,
                 title text,
+                title_lower text,
                 content text,
                 author text,
                 date timestamp
             )
         """)
         
+        # Tables created before title_lower existed need the column added
+        posts_meta = cassandra_cluster.metadata.keyspaces[CASS_KEYSPACE].tables['posts']
+        if 'title_lower' not in posts_meta.columns:
+            cassandra_session.execute("ALTER TABLE posts ADD title_lower text")
+        
+        # Next unreserved post ID. A regular column rather than a counter, so
+        # blocks can be claimed with a compare-and-set
+        cassandra_session.execute("""
+            CREATE TABLE IF NOT EXISTS id_allocator (
+                name text PRIMARY KEY,
+                next_id int
+            )
+        """)
+        
+        # Per-author post counts, maintained on insert
+        cassandra_session.execute("""
+            CREATE TABLE IF NOT EXISTS author_counts (
+                author text PRIMARY KEY,
+                count counter
+            )
+        """)
+        
+        # Posts clustered newest-first so date-sorted reads can be streamed
+        cassandra_session.execute("""
+            CREATE TABLE IF NOT EXISTS posts_by_date (
+                bucket int,
+                date timestamp,
+                id int,
+                title text,
+                content text,
+                author text,
+                PRIMARY KEY (bucket, date, id)
+            ) WITH CLUSTERING ORDER BY (date DESC, id DESC)
+        """)
+        
+        # Prepare hot-path statements once instead of on every call
+        _INSERT_POST_STMT = cassandra_session.prepare(
+            "INSERT INTO posts (id, title, title_lower, content, author, date) "
+            "VALUES (?, ?, ?, ?, ?, ?)"
+        )
+        _INSERT_POST_STMT.consistency_level = ConsistencyLevel.LOCAL_QUORUM
+        
+        _SELECT_ALL_STMT = cassandra_session.prepare(
+            "SELECT id, title, title_lower, content, author, date AS \"Date\" FROM posts "
+            "WHERE token(id) > ? AND token(id) <= ?"
+        )
+        _SELECT_ALL_STMT.fetch_size = READ_FETCH_SIZE
+        
+        _INSERT_POST_BY_DATE_STMT = cassandra_session.prepare(
+            "INSERT INTO posts_by_date (bucket, date, id, title, content, author) "
+            "VALUES (?, ?, ?, ?, ?, ?)"
+        )
+        _INSERT_POST_BY_DATE_STMT.consistency_level = ConsistencyLevel.LOCAL_QUORUM
+        
+        _SELECT_BY_DATE_STMT = cassandra_session.prepare(
+            "SELECT id, title, content, author, date AS \"Date\" "
+            "FROM posts_by_date WHERE bucket = ?"
+        )
+        _SELECT_BY_DATE_STMT.fetch_size = READ_FETCH_SIZE
+        
+        _INCR_AUTHOR_COUNT_STMT = cassandra_session.prepare(
+            "UPDATE author_counts SET count = count + 1 WHERE author = ?"
+        )
+        _SELECT_AUTHOR_COUNTS_STMT = cassandra_session.prepare(
+            "SELECT author, count FROM author_counts"
+        )
+        _COUNT_STMT = cassandra_session.prepare("SELECT COUNT(*) FROM posts")
+        _SELECT_NEXT_ID_STMT = cassandra_session.prepare(
+            "SELECT next_id FROM id_allocator WHERE name = 'post_id'"
+        )
+        _SEED_NEXT_ID_STMT = cassandra_session.prepare(
+            "INSERT INTO id_allocator (name, next_id) VALUES ('post_id', ?) IF NOT EXISTS"
+        )
+        _CAS_NEXT_ID_STMT = cassandra_session.prepare(
+            "UPDATE id_allocator SET next_id = ? WHERE name = 'post_id' IF next_id = ?"
+        )
+        
         print(f"[Cassandra] Connected to keyspace: {CASS_KEYSPACE}")
     except Exception as e:
         print(f"[Cassandra] Connection failed: {e}")
@@ -105,35 +248,25 @@ if MIGRATION_PHASE != MigrationPhase.MONGO_ONLY:
 # ============================================================================
 
 def _mongo_get_posts(sort_by="date"):
-    """Get posts from MongoDB."""
-    all_posts = list(posts_collection.find({}, {'_id': 0}))
-    
-    # Format dates for JSON response
-    for post in all_posts:
-        if isinstance(post.get('Date'), datetime):
-            post['Date'] = post['Date'].strftime("%Y-%m-%d %H:%M:%S")
-    
+    """Get posts from MongoDB, sorted server-side on the Date/title indexes."""
+    # Posts written by older versions may still carry a title_lower field
+    cursor = posts_collection.find({}, {'_id': 0, 'title_lower': 0})
     if sort_by == "title":
-        return sorted(all_posts, key=lambda x: x.get('title', '').lower())
+        cursor = cursor.sort('title', 1).collation(TITLE_COLLATION)
     else:
-        return sorted(all_posts, key=lambda x: x.get('Date', ''), reverse=True)
+        cursor = cursor.sort('Date', -1)
+    
+    # Dates stay as datetime objects; the app's JSON provider formats them
+    return list(cursor)
 
 
 def _mongo_add_post(new_data):
-    """Add post to MongoDB."""
-    new_data['Date'] = datetime.now()
-    last_post = posts_collection.find_one(sort=[("id", -1)])
-    new_data['id'] = (last_post['id'] + 1) if last_post else 1
-    
-    if 'author' not in new_data or not new_data['author']:
-        new_data['author'] = "Anonymous"
-    
+    """Add post to MongoDB. Expects 'id' and 'Date' to be set by the caller."""
     posts_collection.insert_one(new_data)
     
     response_data = new_data.copy()
     if '_id' in response_data:
         del response_data['_id']
-    response_data['Date'] = response_data['Date'].strftime("%Y-%m-%d %H:%M:%S")
     return response_data
 
 
@@ -147,103 +280,452 @@ def _mongo_get_user_post_counts():
 
 
 def _mongo_get_next_id():
-    """Get the next available post ID from MongoDB."""
+    """Allocate the next post ID from the MongoDB post_id counter document."""
+    doc = counters_collection.find_one_and_update(
+        {'_id': 'post_id'},
+        {'$inc': {'seq': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc['seq']
+
+
+def _mongo_sync_post_id_counter():
+    """
+    Move the post_id counter up to the highest post ID in MongoDB.
+    
+    Covers posts inserted without going through the counter, such as the
+    sample data from insert_data.py. The lookup is served by the id index.
+    """
     last_post = posts_collection.find_one(sort=[("id", -1)])
-    return (last_post['id'] + 1) if last_post else 1
+    if last_post:
+        counters_collection.update_one(
+            {'_id': 'post_id'},
+            {'$max': {'seq': last_post['id']}},
+            upsert=True
+        )
 
 
 # ============================================================================
 # Cassandra Operations
 # ============================================================================
 
+# All posts share one posts_by_date partition, which stays small for a blog
+POSTS_BY_DATE_BUCKET = 0
+
+# Murmur3Partitioner token bounds
+_MIN_TOKEN = -2 ** 63
+_MAX_TOKEN = 2 ** 63 - 1
+
+
+def _token_ranges(count):
+    """Split the token ring into `count` contiguous (start, end] ranges."""
+    step = (_MAX_TOKEN - _MIN_TOKEN) // count
+    bounds = [_MIN_TOKEN + i * step for i in range(count)] + [_MAX_TOKEN]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _scan_token_ranges(session, stmt, count, **kwargs):
+    """
+    Return every row `stmt` reads over `count` token ranges.
+    
+    Each range is paged from the driver's callbacks: the next page is
+    requested as soon as the previous one arrives, so the pages of all
+    ranges are fetched side by side rather than one after another.
+    """
+    ranges = _token_ranges(count)
+    rows = []
+    errors = []
+    remaining = [len(ranges)]
+    lock = threading.Lock()
+    done = threading.Event()
+    
+    def finish(exc=None):
+        with lock:
+            if exc is not None:
+                errors.append(exc)
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                done.set()
+    
+    def scan(token_range):
+        future = session.execute_async(stmt, token_range, **kwargs)
+        
+        def on_page(page):
+            with lock:
+                rows.extend(page)
+            if future.has_more_pages:
+                future.start_fetching_next_page()
+            else:
+                finish()
+        
+        future.add_callbacks(callback=on_page, errback=finish)
+    
+    for token_range in ranges:
+        scan(token_range)
+    done.wait()
+    
+    if errors:
+        raise errors[0]
+    return rows
+
+
 def _cassandra_get_posts(sort_by="date"):
-    """Get posts from Cassandra."""
-    query = "SELECT id, title, content, author, date FROM posts"
-    rows = cassandra_session.execute(query)
-    
-    all_posts = []
-    for row in rows:
-        post = {
-            'id': row.id,
-            'title': row.title,
-            'content': row.content,
-            'author': row.author,
-            'Date': row.date.strftime("%Y-%m-%d %H:%M:%S") if row.date else ""
-        }
-        all_posts.append(post)
+    """
+    Get posts from Cassandra.
+    
+    The table is scanned as READ_CONCURRENCY token ranges whose pages are
+    fetched in parallel.
+    """
+    # Rows already come back as response-shaped dicts
+    all_posts = _scan_token_ranges(
+        cassandra_session, _SELECT_ALL_STMT, READ_CONCURRENCY, execution_profile=DICT_PROFILE
+    )
     
     if sort_by == "title":
-        return sorted(all_posts, key=lambda x: x.get('title', '').lower())
+        # Rows written before title_lower existed fall back to lower()
+        for post in all_posts:
+            if post['title_lower'] is None:
+                post['title_lower'] = str(post['title'] or '').lower()
+        all_posts.sort(key=itemgetter('title_lower'))
     else:
-        return sorted(
-            all_posts,
-            key=lambda x: x['Date'] if x['Date'] else '',
-            reverse=True
-        )
+        all_posts.sort(key=_date_sort_key, reverse=True)
+    
+    for post in all_posts:
+        del post['title_lower']
+    return all_posts
 
 
-def _cassandra_add_post(post_data):
-    """Add post to Cassandra."""
-    insert_query = """
-        INSERT INTO posts (id, title, content, author, date)
-        VALUES (?, ?, ?, ?, ?)
+def _date_sort_key(post):
+    """Sort key for newest-first ordering; undated posts go last."""
+    return post['Date'] or datetime.min
+
+
+def _cassandra_stream_posts_by_date():
+    """
+    Return an iterator of posts from Cassandra newest first, one page in memory at a time.
+    
+    Reads the date-clustered posts_by_date table, so rows already arrive in
+    order and need no sorting. The first page is fetched before returning,
+    so a Cassandra failure surfaces before the response has started.
+    """
+    rows = cassandra_session.execute(
+        _SELECT_BY_DATE_STMT, (POSTS_BY_DATE_BUCKET,), execution_profile=DICT_PROFILE
+    )
+    return iter(rows)
+
+
+def _cassandra_post_writes(post_data):
     """
-    prepared = cassandra_session.prepare(insert_query)
+    Build the Cassandra writes for a new post.
     
+    Returns (post, writes, count_write): the post as returned to callers,
+    the idempotent inserts into posts and posts_by_date, and the
+    author_counts increment, which is not idempotent.
+    """
     # Parse date if it's a string
     post_date = post_data.get('Date')
     if isinstance(post_date, str):
-        post_date = datetime.strptime(post_date, "%Y-%m-%d %H:%M:%S")
+        post_date = datetime.fromisoformat(post_date)
     elif not isinstance(post_date, datetime):
-        post_date = datetime.now()
+        post_date = datetime.now(timezone.utc)
+    
+    author = post_data.get('author', 'Anonymous')
     
-    cassandra_session.execute(
-        prepared,
+    writes = [
+        (
+            _INSERT_POST_STMT,
+            (
+                post_data['id'],
+                post_data['title'],
+                str(post_data['title'] or '').lower(),
+                post_data['content'],
+                author,
+                post_date
+            )
+        ),
         (
-            post_data['id'],
-            post_data['title'],
-            post_data['content'],
-            post_data.get('author', 'Anonymous'),
-            post_date
+            _INSERT_POST_BY_DATE_STMT,
+            (
+                POSTS_BY_DATE_BUCKET,
+                post_date,
+                post_data['id'],
+                post_data['title'],
+                post_data['content'],
+                author
+            )
         )
-    )
-    
-    return {
+    ]
+    post = {
         'id': post_data['id'],
         'title': post_data['title'],
         'content': post_data['content'],
-        'author': post_data.get('author', 'Anonymous'),
-        'Date': post_date.strftime("%Y-%m-%d %H:%M:%S")
+        'author': author,
+        'Date': post_date
     }
+    return post, writes, (_INCR_AUTHOR_COUNT_STMT, (author,))
 
 
-def _cassandra_get_user_post_counts():
-    """Get user post counts from Cassandra."""
-    query = "SELECT author FROM posts"
-    rows = cassandra_session.execute(query)
-    
-    author_counts = {}
-    for row in rows:
-        author = row.author or "Anonymous"
-        author_counts[author] = author_counts.get(author, 0) + 1
-    
-    return [
-        {'author': author, 'count': count}
-        for author, count in author_counts.items()
+def _cassandra_add_post(post_data):
+    """Add post to Cassandra."""
+    post, writes, count_write = _cassandra_post_writes(post_data)
+    
+    # The three writes are independent, so send them together
+    futures = [
+        cassandra_session.execute_async(stmt, params)
+        for stmt, params in writes + [count_write]
     ]
+    for future in futures:
+        future.result()
+    
+    return post
+
+
+def _cassandra_get_user_post_counts():
+    """Get user post counts from the Cassandra author_counts table."""
+    return list(cassandra_session.execute(
+        _SELECT_AUTHOR_COUNTS_STMT, execution_profile=DICT_PROFILE
+    ))
+
+
+# Post IDs are reserved from id_allocator in blocks; see _cassandra_get_next_id()
+ID_BLOCK_SIZE = int(os.environ.get('ID_BLOCK_SIZE', 20))
+_id_block_lock = threading.Lock()
+_id_block_next = 1
+_id_block_end = 0
 
 
 def _cassandra_get_next_id():
-    """Get the next available post ID from Cassandra."""
-    result = cassandra_session.execute("SELECT MAX(id) as max_id FROM posts")
-    row = result.one()
-    return (row.max_id + 1) if row and row.max_id is not None else 1
+    """
+    Hand out the next post ID from a block reserved in id_allocator.
+    
+    Reserving ID_BLOCK_SIZE IDs per compare-and-set means most inserts skip
+    the allocator round trips. IDs left in a block are skipped on restart.
+    """
+    global _id_block_next, _id_block_end
+    with _id_block_lock:
+        if _id_block_next > _id_block_end:
+            _id_block_next = _cassandra_reserve_id_block()
+            _id_block_end = _id_block_next + ID_BLOCK_SIZE - 1
+        next_id = _id_block_next
+        _id_block_next += 1
+        return next_id
+
+
+def _cassandra_sync_post_id_counter():
+    """
+    Move the post ID allocator past the highest post ID in Cassandra.
+    
+    Posts copied by the migration tools keep their MongoDB IDs, so the
+    allocator can lag behind the table. This scans the table once at
+    startup instead of on every insert, and only ever moves it forward.
+    """
+    row = cassandra_session.execute("SELECT MAX(id) as max_id FROM posts").one()
+    max_id = row.max_id if row and row.max_id is not None else 0
+    
+    result = cassandra_session.execute(_SEED_NEXT_ID_STMT, (max_id + 1,))
+    if result.was_applied:
+        return
+    current = result.one().next_id
+    while current <= max_id:
+        result = cassandra_session.execute(_CAS_NEXT_ID_STMT, (max_id + 1, current))
+        if result.was_applied:
+            return
+        current = result.one().next_id
+
+
+def _cassandra_reserve_id_block():
+    """
+    Claim the next ID_BLOCK_SIZE post IDs and return the first of them.
+    
+    The claim is a lightweight transaction, so two processes can never be
+    handed the same block; a lost race just retries from the value that won.
+    """
+    row = cassandra_session.execute(_SELECT_NEXT_ID_STMT).one()
+    if row is None:
+        _cassandra_sync_post_id_counter()
+        row = cassandra_session.execute(_SELECT_NEXT_ID_STMT).one()
+    
+    current = row.next_id
+    while True:
+        result = cassandra_session.execute(_CAS_NEXT_ID_STMT, (current + ID_BLOCK_SIZE, current))
+        if result.was_applied:
+            return current
+        current = result.one().next_id
+
+
+# ============================================================================
+# Read Cache
+# ============================================================================
+
+# Short-lived cache for the read endpoints. It lives in each process: a
+# write clears it only in the worker that handled it, so other gunicorn
+# workers can serve reads up to READ_CACHE_TTL seconds old.
+READ_CACHE_TTL = float(os.environ.get('READ_CACHE_TTL', 3))
+_read_cache = TTLCache(maxsize=128, ttl=READ_CACHE_TTL)
+_read_cache_lock = threading.Lock()
+_read_cache_generation = 0
+
+
+def _cached_read(key, loader):
+    """Return the cached value for `key`, calling `loader()` on a miss."""
+    with _read_cache_lock:
+        if key in _read_cache:
+            return _read_cache[key]
+        generation = _read_cache_generation
+    
+    value = loader()
+    
+    with _read_cache_lock:
+        # Drop results loaded before a write invalidated the cache
+        if generation == _read_cache_generation:
+            _read_cache[key] = value
+    return value
+
+
+def _invalidate_read_cache():
+    """Clear this process's cached reads after a write."""
+    global _read_cache_generation
+    with _read_cache_lock:
+        _read_cache_generation += 1
+        _read_cache.clear()
+
+
+# ============================================================================
+# Background Replication (DUAL_WRITE)
+# ============================================================================
+
+# Cassandra writes queued by add_post during DUAL_WRITE. READ_CASSANDRA
+# writes inline instead, since its reads come from Cassandra and must see
+# the post as soon as add_post returns
+replication_queue = queue.Queue(maxsize=10000)
+REPLICATION_MAX_RETRIES = 5
+REPLICATION_RETRY_DELAY = 0.5
+
+
+def _replicate_post(post_data):
+    """
+    Write one queued post to Cassandra, retrying only the inserts that failed.
+    
+    The posts and posts_by_date inserts are idempotent and are retried with
+    exponential backoff. The author_counts increment is sent once, after
+    they succeed: a counter update that timed out may still have been
+    applied, so retrying it could count the post twice.
+    """
+    post_id = post_data['id']
+    _, pending, count_write = _cassandra_post_writes(post_data)
+    
+    for attempt in range(REPLICATION_MAX_RETRIES):
+        futures = [(write, cassandra_session.execute_async(*write)) for write in pending]
+        pending = []
+        for write, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                pending.append(write)
+                error = e
+        if not pending:
+            break
+        
+        print(f"[Dual Write] Cassandra write for post {post_id} failed "
+              f"(attempt {attempt + 1}/{REPLICATION_MAX_RETRIES}): {error}")
+        if attempt + 1 < REPLICATION_MAX_RETRIES:
+            time.sleep(REPLICATION_RETRY_DELAY * 2 ** attempt)
+    else:
+        print(f"[Dual Write] Giving up on post {post_id}")
+        return
+    
+    try:
+        cassandra_session.execute(*count_write)
+    except Exception as e:
+        print(f"[Dual Write] Author count for post {post_id} not updated: {e} "
+              f"(fix with: python migration_controller.py rebuild-counts)")
+    print(f"[Dual Write] Post {post_id} replicated to Cassandra")
+
+
+def _replication_worker():
+    """Write queued posts to Cassandra until the process exits."""
+    while True:
+        post_data = replication_queue.get()
+        try:
+            _replicate_post(post_data)
+        except Exception as e:
+            print(f"[Dual Write] Giving up on post {post_data.get('id')}: {e}")
+        finally:
+            replication_queue.task_done()
+
+
+def get_replication_lag():
+    """Return the number of posts still waiting to be written to Cassandra."""
+    return replication_queue.qsize()
+
+
+def drain_replication_queue(timeout=30):
+    """
+    Wait up to `timeout` seconds for queued Cassandra writes to finish.
+    
+    Returns True if the queue was fully drained.
+    """
+    waiter = threading.Thread(target=replication_queue.join, daemon=True)
+    waiter.start()
+    waiter.join(timeout)
+    if waiter.is_alive():
+        print(f"[Dual Write] Exiting with {replication_queue.qsize()} posts not replicated")
+        return False
+    return True
+
+
+# ============================================================================
+# Connection Setup
+# ============================================================================
+
+# Connections are opened on first use rather than at import, so a process
+# that forks after importing this module (gunicorn preload) doesn't share
+# sockets or the driver's IO thread with its workers
+_connections_lock = threading.Lock()
+_connections_ready = False
+
+
+def _init_connections():
+    """
+    Open the database connections for this process.
+    
+    Called from gunicorn's post_fork hook and lazily by every public
+    function; only the first call does any work.
+    """
+    global _connections_ready
+    if _connections_ready:
+        return
+    
+    with _connections_lock:
+        if _connections_ready:
+            return
+        
+        if MIGRATION_PHASE != MigrationPhase.CASSANDRA_ONLY:
+            _connect_mongo()
+            if posts_collection is not None:
+                _mongo_sync_post_id_counter()
+        
+        if MIGRATION_PHASE != MigrationPhase.MONGO_ONLY:
+            _connect_cassandra()
+            if MIGRATION_PHASE == MigrationPhase.CASSANDRA_ONLY:
+                # Cassandra allocates IDs in this phase
+                _cassandra_sync_post_id_counter()
+        
+        if MIGRATION_PHASE == MigrationPhase.DUAL_WRITE:
+            threading.Thread(
+                target=_replication_worker, name='cassandra-replication', daemon=True
+            ).start()
+            atexit.register(drain_replication_queue)
+        
+        _connections_ready = True
 
 
 # ============================================================================
 # Public API - Phase-aware operations
 # ============================================================================
 
+
 def get_posts(sort_by="date"):
     """
     Retrieve all posts, sorted by date or title.
@@ -251,11 +733,29 @@ def get_posts(sort_by="date"):
     Read source depends on migration phase:
     - MONGO_ONLY, DUAL_WRITE: Read from MongoDB
     - READ_CASSANDRA, CASSANDRA_ONLY: Read from Cassandra
+    
+    Results are cached per sort order for a few seconds.
     """
+    _init_connections()
     if MIGRATION_PHASE in [MigrationPhase.MONGO_ONLY, MigrationPhase.DUAL_WRITE]:
-        return _mongo_get_posts(sort_by)
+        loader = _mongo_get_posts
     else:
-        return _cassandra_get_posts(sort_by)
+        loader = _cassandra_get_posts
+    return _cached_read(('posts', sort_by), lambda: loader(sort_by))
+
+
+def stream_posts(sort_by="date"):
+    """
+    Return a generator of posts for streaming, or None if unsupported.
+    
+    Streaming is only available for date-sorted reads from Cassandra
+    (READ_CASSANDRA, CASSANDRA_ONLY); callers should fall back to
+    get_posts() when this returns None.
+    """
+    _init_connections()
+    if sort_by == "title" or MIGRATION_PHASE in [MigrationPhase.MONGO_ONLY, MigrationPhase.DUAL_WRITE]:
+        return None
+    return _cassandra_stream_posts_by_date()
 
 
 def add_post(new_data):
@@ -267,57 +767,95 @@ def add_post(new_data):
     - DUAL_WRITE, READ_CASSANDRA: Write to both MongoDB and Cassandra
     - CASSANDRA_ONLY: Write to Cassandra only
     """
+    _init_connections()
+    
     # Set defaults
     if 'author' not in new_data or not new_data['author']:
         new_data['author'] = "Anonymous"
     
+    new_data['Date'] = datetime.now(timezone.utc)
+    
     if MIGRATION_PHASE == MigrationPhase.MONGO_ONLY:
-        return _mongo_add_post(new_data)
+        new_data['id'] = _mongo_get_next_id()
+        result = _mongo_add_post(new_data)
     
     elif MIGRATION_PHASE == MigrationPhase.CASSANDRA_ONLY:
-        # Get next ID from Cassandra
+        # Allocate next ID from the Cassandra counter
         new_data['id'] = _cassandra_get_next_id()
-        new_data['Date'] = datetime.now()
-        return _cassandra_add_post(new_data)
+        result = _cassandra_add_post(new_data)
     
     else:
         # DUAL_WRITE or READ_CASSANDRA: Write to both
-        # First write to MongoDB to get the ID
-        mongo_result = _mongo_add_post(new_data.copy())
+        new_data['id'] = _mongo_get_next_id()
+        cassandra_data = new_data.copy()
         
-        # Then write to Cassandra with same data
-        cassandra_data = {
-            'id': mongo_result['id'],
-            'title': mongo_result['title'],
-            'content': mongo_result['content'],
-            'author': mongo_result['author'],
-            'Date': mongo_result['Date']
-        }
+        result = _mongo_add_post(new_data)
         
-        try:
-            _cassandra_add_post(cassandra_data)
-            print(f"[Dual Write] Post {mongo_result['id']} written to both databases")
-        except Exception as e:
-            print(f"[Dual Write] Cassandra write failed: {e}")
-            # In production, you might want to handle this differently
+        if MIGRATION_PHASE == MigrationPhase.DUAL_WRITE:
+            # Reads still come from MongoDB, so the Cassandra copy is
+            # replicated in the background and a slow cluster doesn't hold
+            # up the request
+            try:
+                replication_queue.put_nowait(cassandra_data)
+                cassandra_data = None
+            except queue.Full:
+                # Queue is backed up; fall back to writing inline rather than dropping the post
+                print(f"[Dual Write] Replication queue full, writing post {result['id']} inline")
         
-        return mongo_result
+        if cassandra_data is not None:
+            try:
+                _cassandra_add_post(cassandra_data)
+            except Exception as e:
+                print(f"[Dual Write] Cassandra write failed: {e}")
+    
+    _invalidate_read_cache()
+    return result
 
 
 def get_user_post_counts():
     """
     Get post count for each author.
     
-    Read source depends on migration phase.
+    Read source depends on migration phase. Results are cached for a few
+    seconds.
     """
+    _init_connections()
     if MIGRATION_PHASE in [MigrationPhase.MONGO_ONLY, MigrationPhase.DUAL_WRITE]:
-        return _mongo_get_user_post_counts()
+        loader = _mongo_get_user_post_counts
     else:
-        return _cassandra_get_user_post_counts()
+        loader = _cassandra_get_user_post_counts
+    return _cached_read(('user_post_counts',), loader)
+
+
+@ttl_cache(maxsize=1, ttl=10)
+def _post_counts():
+    """
+    Count posts in each connected database.
+    
+    COUNT(*) is a full scan on Cassandra, so repeated status polls share
+    one result for a few seconds.
+    """
+    counts = {}
+    if mongo_client is not None:
+        try:
+            # Reads the collection metadata instead of scanning every document
+            counts['mongodb_post_count'] = posts_collection.estimated_document_count()
+        except:
+            counts['mongodb_post_count'] = 'error'
+    
+    if cassandra_session is not None:
+        try:
+            result = cassandra_session.execute(_COUNT_STMT)
+            counts['cassandra_post_count'] = result.one()[0]
+        except:
+            counts['cassandra_post_count'] = 'error'
+    
+    return counts
 
 
 def get_migration_status():
     """Get current migration phase and database status."""
+    _init_connections()
     status = {
         'phase': MIGRATION_PHASE.value,
         'mongodb_connected': mongo_client is not None,
@@ -325,17 +863,6 @@ def get_migration_status():
     }
     
     # Get counts from each database
-    if mongo_client is not None:
-        try:
-            status['mongodb_post_count'] = posts_collection.count_documents({})
-        except:
-            status['mongodb_post_count'] = 'error'
-    
-    if cassandra_session is not None:
-        try:
-            result = cassandra_session.execute("SELECT COUNT(*) FROM posts")
-            status['cassandra_post_count'] = result.one()[0]
-        except:
-            status['cassandra_post_count'] = 'error'
+    status.update(_post_counts())
     
     return status
@@ -0,0 +1,33 @@
+"""
+Gunicorn configuration for the blog application.
+
+Usage:
+    gunicorn app:app
+
+The pymongo and cassandra-driver calls block, so each worker runs a pool
+of threads that keep serving requests while others wait on the databases.
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+
+# The data layer connects lazily, so each worker opens its own MongoDB and
+# Cassandra connections after the fork whether or not the app is preloaded
+preload_app = False
+
+
+def post_fork(server, worker):
+    """Open the worker's database connections before it takes requests."""
+    import data_migration
+    data_migration._init_connections()
+
+
+def worker_exit(server, worker):
+    """Flush queued Cassandra dual writes before the worker goes away."""
+    import data_migration
+    data_migration.drain_replication_queue()
@@ -3,7 +3,7 @@ Sample data insertion script for the blog application.
 Run this to populate your MongoDB with test data.
 """
 from pymongo import MongoClient
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import random
 
 # Connect to MongoDB
@@ -18,42 +18,42 @@ sample_posts = [
         "title": "Welcome to My Blog",
         "content": "This is the first post on my blog. I'm excited to share my thoughts and ideas with you!",
         "author": "Ahmed",
-        "Date": datetime.now() - timedelta(days=10)
+        "Date": datetime.now(timezone.utc) - timedelta(days=10)
     },
     {
         "id": 2,
         "title": "Introduction to Python",
         "content": "Python is a powerful and versatile programming language. In this post, I'll cover the basics of Python programming.",
         "author": "Sarah",
-        "Date": datetime.now() - timedelta(days=8)
+        "Date": datetime.now(timezone.utc) - timedelta(days=8)
     },
     {
         "id": 3,
         "title": "Web Development with Flask",
         "content": "Flask is a lightweight web framework for Python. It's perfect for building small to medium-sized web applications.",
         "author": "Ahmed",
-        "Date": datetime.now() - timedelta(days=6)
+        "Date": datetime.now(timezone.utc) - timedelta(days=6)
     },
     {
         "id": 4,
         "title": "Database Migration Best Practices",
         "content": "When migrating databases, it's important to plan carefully and test thoroughly. Here are some best practices to follow.",
         "author": "John",
-        "Date": datetime.now() - timedelta(days=4)
+        "Date": datetime.now(timezone.utc) - timedelta(days=4)
     },
     {
         "id": 5,
         "title": "Understanding NoSQL Databases",
         "content": "NoSQL databases like MongoDB and Cassandra offer flexible schemas and horizontal scalability. Let's explore when to use them.",
         "author": "Sarah",
-        "Date": datetime.now() - timedelta(days=2)
+        "Date": datetime.now(timezone.utc) - timedelta(days=2)
     },
     {
         "id": 6,
         "title": "Building RESTful APIs",
         "content": "REST APIs are the backbone of modern web applications. Learn how to design and implement clean, efficient APIs.",
         "author": "Ahmed",
-        "Date": datetime.now() - timedelta(days=1)
+        "Date": datetime.now(timezone.utc) - timedelta(days=1)
     },
 ]
 
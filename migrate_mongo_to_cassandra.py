@@ -7,13 +7,50 @@ preserving the blog post structure with proper data types.
 Author: Custom Blog Migration Tool
 """
 import argparse
-import json
+import importlib.util
+import math
 import os
 import sys
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from operator import itemgetter
 from pymongo import MongoClient
-from cassandra.cluster import Cluster
-from cassandra.query import BatchStatement
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
+from cassandra.concurrent import execute_concurrent, execute_concurrent_with_args
+from cassandra.policies import DCAwareRoundRobinPolicy, TokenAwarePolicy
+from cassandra.query import BatchStatement, BatchType
+
+# Most rows put in one UNLOGGED batch
+MAX_BATCH_SIZE = 100
+
+# Most row data put in one batch. Cassandra rejects batches over
+# batch_size_fail_threshold_in_kb (50 KB by default) of serialized rows,
+# whatever their count, so batches are also cut by estimated size
+MAX_BATCH_BYTES = 40 * 1024
+
+# Rows between progress lines
+PROGRESS_EVERY = 1000
+
+# Normalizes posts on the MongoDB side: missing or null fields get their
+# defaults, and the date may be stored as either 'Date' or 'date'
+POSTS_PIPELINE = [
+    {'$project': {
+        '_id': 0,
+        'id': {'$ifNull': ['$id', None]},
+        'title': {'$ifNull': ['$title', 'Untitled']},
+        'content': {'$ifNull': ['$content', '']},
+        'author': {'$ifNull': ['$author', 'Anonymous']},
+        'date': {'$ifNull': ['$Date', {'$ifNull': ['$date', None]}]}
+    }}
+]
+_get_post_fields = itemgetter('id', 'title', 'content', 'author', 'date')
+
+# Date given to posts with a missing or unparseable date. Fixed rather than
+# the time of the run, so re-running the migration writes the same
+# posts_by_date clustering key; sorts undated posts last, as the app does.
+FALLBACK_DATE = datetime(1970, 1, 1)
 
 
 def mongo_client(uri):
@@ -31,8 +68,27 @@ def mongo_client(uri):
 def cassandra_session(contact_points, port=9042):
     """Create Cassandra session connection."""
     try:
-        cluster = Cluster(contact_points, port=port)
+        # Token-aware routing sends each insert straight to a replica.
+        # Connections per host are left at the driver default: with protocol
+        # v3+ one connection multiplexes up to 32k concurrent requests and
+        # set_core/max_connections_per_host raise, so --concurrency is the
+        # knob that controls how hard the cluster is driven.
+        cluster = Cluster(
+            contact_points,
+            port=port,
+            protocol_version=4,
+            execution_profiles={
+                EXEC_PROFILE_DEFAULT: ExecutionProfile(
+                    load_balancing_policy=TokenAwarePolicy(DCAwareRoundRobinPolicy())
+                )
+            }
+        )
         session = cluster.connect()
+        
+        # The driver already prefers the libev reactor and falls back to
+        # asyncore when its C extension isn't built, so just report which
+        # one this run got
+        print(f"Cassandra I/O reactor: {cluster.connection_class.__name__}")
         return session, cluster
     except Exception as e:
         print(f"Error connecting to Cassandra: {e}")
@@ -60,143 +116,482 @@ def ensure_blog_table(session, keyspace):
     Schema:
     - id: int (primary key) - post ID
     - title: text - post title
+    - title_lower: text - lowercased title, used as the title sort key
     - content: text - post content
     - author: text - post author
     - date: timestamp - post creation date
+    
+    Also creates the author_counts counter table the app reads post
+    counts from, and the posts_by_date table it streams date-sorted
+    reads from.
     """
     cql = f"""
         CREATE TABLE IF NOT EXISTS {keyspace}.posts (
             id int PRIMARY KEY,
             title text,
+            title_lower text,
             content text,
             author text,
             date timestamp
         )
     """
+    counts_cql = f"""
+        CREATE TABLE IF NOT EXISTS {keyspace}.author_counts (
+            author text PRIMARY KEY,
+            count counter
+        )
+    """
+    by_date_cql = f"""
+        CREATE TABLE IF NOT EXISTS {keyspace}.posts_by_date (
+            bucket int,
+            date timestamp,
+            id int,
+            title text,
+            content text,
+            author text,
+            PRIMARY KEY (bucket, date, id)
+        ) WITH CLUSTERING ORDER BY (date DESC, id DESC)
+    """
     try:
         session.execute(cql)
+        # Tables created before title_lower existed need the column added
+        columns = session.cluster.metadata.keyspaces[keyspace].tables['posts'].columns
+        if 'title_lower' not in columns:
+            session.execute(f"ALTER TABLE {keyspace}.posts ADD title_lower text")
+        session.execute(counts_cql)
+        session.execute(by_date_cql)
         print(f"Table '{keyspace}.posts' ready.")
     except Exception as e:
         print(f"Error creating table: {e}")
         sys.exit(1)
 
 
-def migrate_blog_posts(mongo_db, cass_session, keyspace, batch_size=50, dry_run=False):
+def _row_to_params(doc, fallback_date):
+    """Turn one document from POSTS_PIPELINE into posts insert parameters."""
+    post_id, title, content, author, post_date = _get_post_fields(doc)
+    
+    # BSON dates decode to exactly datetime, so the common case is one check
+    if type(post_date) is not datetime:
+        if isinstance(post_date, str):
+            # Parse string date
+            try:
+                post_date = datetime.fromisoformat(post_date)
+            except ValueError:
+                post_date = fallback_date
+        else:
+            post_date = fallback_date
+    
+    return (post_id, title, str(title or '').lower(), content, author, post_date)
+
+
+def _row_bytes(values):
+    """Rough serialized size of a row's values, for sizing batches."""
+    return sum(len(v.encode()) if isinstance(v, str) else 8 for v in values)
+
+
+def _report_progress(done, total):
+    """Write one progress line; kept off the per-row path by the callers."""
+    sys.stdout.write(f"Progress: {done}/{total} posts migrated...\n")
+    sys.stdout.flush()
+
+
+# Column order of the posts read through pymongoarrow
+_ARROW_COLUMNS = ('id', 'title', 'content', 'author', 'date')
+
+
+def _arrow_rows(posts_collection, fallback_date):
+    """
+    Yield post rows read through pymongoarrow, one record batch at a time.
+    
+    The collection is decoded straight into typed Arrow columns instead of
+    a dict per document. Raises ImportError if pymongoarrow isn't installed.
+    """
+    from pyarrow import int32, string, timestamp
+    from pymongoarrow.api import Schema, aggregate_arrow_all
+    
+    schema = Schema(dict(zip(
+        _ARROW_COLUMNS, (int32(), string(), string(), string(), timestamp('ms'))
+    )))
+    table = aggregate_arrow_all(posts_collection, POSTS_PIPELINE, schema=schema)
+    
+    for batch in table.to_batches(max_chunksize=1000):
+        columns = [batch.column(name).to_pylist() for name in _ARROW_COLUMNS]
+        for post_id, title, content, author, post_date in zip(*columns):
+            yield (post_id, title, str(title or '').lower(), content, author, post_date or fallback_date)
+
+
+def _id_ranges(posts_collection, count):
+    """
+    Split the collection's numeric id span into `count` contiguous [lo, hi) ranges.
+    
+    Returns [] when no post has a numeric id. Non-numeric ids are left to
+    the caller's catch-all slice.
+    """
+    # BSON sorts strings and ObjectIds above numbers, so only numeric ids
+    # may take part in the bounds
+    bounds = list(posts_collection.aggregate([
+        {'$match': {'id': {'$type': 'number'}}},
+        {'$group': {'_id': None, 'min': {'$min': '$id'}, 'max': {'$max': '$id'}}}
+    ]))
+    if not bounds:
+        return []
+    
+    # Floor/ceil the bounds so float ids still give integer range() limits
+    lo, hi = math.floor(bounds[0]['min']), math.floor(bounds[0]['max']) + 1
+    step = max(1, -(-(hi - lo) // count))
+    return [(start, min(start + step, hi)) for start in range(lo, hi, step)]
+
+
+def migrate_blog_posts(mongo_db, cass_session, keyspace, concurrency=128, dry_run=False,
+                       batch_size=None, use_arrow=False, workers=1):
     """
     Migrate blog posts from MongoDB to Cassandra.
     
+    Every post is its own partition, so rows are written as concurrent
+    single inserts rather than a multi-partition BATCH. Passing batch_size
+    groups posts rows into UNLOGGED batches of rows owned by the same
+    replica, and posts_by_date rows into batches of their own partition.
+    
+    Each post is written to both posts and posts_by_date from the same
+    parameters. posts_by_date is truncated first, so a re-run leaves no
+    rows behind for posts whose date changed; run this before the app
+    starts dual writes, or posts it writes there in the meantime are lost.
+    
     Args:
         mongo_db: MongoDB database object
         cass_session: Cassandra session object
         keyspace: Target Cassandra keyspace
-        batch_size: Number of records per batch
+        concurrency: Number of inserts (or batches) kept in flight
         dry_run: If True, only show what would be migrated
+        batch_size: Rows per UNLOGGED batch, at most MAX_BATCH_SIZE;
+            batches are also cut at MAX_BATCH_BYTES of row data. None
+            writes single-row inserts
+        use_arrow: Read MongoDB through pymongoarrow when it is installed
+        workers: Number of threads reading separate id ranges of MongoDB
     
     Returns:
-        Number of migrated posts
+        (migrated, complete): number of migrated posts, and whether every
+        post read from MongoDB was written without errors
     """
     posts_collection = mongo_db['posts']
-    total = posts_collection.count_documents({})
+    total = posts_collection.estimated_document_count()
     
     if total == 0:
         print("No posts found in MongoDB. Nothing to migrate.")
-        return 0
+        return 0, True
     
-    print(f"Found {total} posts to migrate.")
+    print(f"Found about {total} posts to migrate.")
     
     # Ensure table exists
     ensure_blog_table(cass_session, keyspace)
     
     # Prepare insert statement
     insert_cql = f"""
-        INSERT INTO {keyspace}.posts (id, title, content, author, date)
-        VALUES (?, ?, ?, ?, ?)
+        INSERT INTO {keyspace}.posts (id, title, title_lower, content, author, date)
+        VALUES (?, ?, ?, ?, ?, ?)
     """
     prepared = cass_session.prepare(insert_cql)
+    by_date = cass_session.prepare(f"""
+        INSERT INTO {keyspace}.posts_by_date (bucket, date, id, title, content, author)
+        VALUES (0, ?, ?, ?, ?, ?)
+    """)
     
-    migrated = 0
-    errors = 0
-    cursor = posts_collection.find({})
+    if use_arrow and importlib.util.find_spec('pymongoarrow') is None:
+        print("pymongoarrow is not installed; reading documents with a regular cursor.")
+        use_arrow = False
     
-    batch = BatchStatement()
+    # Rows written so far across all workers, for progress reporting, and
+    # failures raised while reading rows rather than writing them
+    progress_lock = threading.Lock()
+    progress_done = 0
+    read_errors = 0
+    read_failed = False
     
-    for doc in cursor:
+    def params(match=None):
+        # The driver pulls rows from this generator inside its callbacks and
+        # drops any exception raised there, which would silently end the
+        # migration early. Errors are therefore caught and counted here.
+        nonlocal read_errors, read_failed
         try:
-            # Extract fields with defaults
-            post_id = doc.get('id')
-            title = doc.get('title', 'Untitled')
-            content = doc.get('content', '')
-            author = doc.get('author', 'Anonymous')
+            if use_arrow:
+                yield from _arrow_rows(posts_collection, FALLBACK_DATE)
+                return
             
-            # Handle date field (could be 'Date' or 'date')
-            post_date = doc.get('Date') or doc.get('date')
-            if isinstance(post_date, str):
-                # Parse string date
+            pipeline = ([{'$match': match}] if match else []) + POSTS_PIPELINE
+            cursor = posts_collection.aggregate(pipeline, batchSize=1000, allowDiskUse=True)
+            for doc in cursor:
                 try:
-                    post_date = datetime.strptime(post_date, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    post_date = datetime.now()
-            elif not isinstance(post_date, datetime):
-                post_date = datetime.now()
-            
-            if dry_run:
-                print(f"[DRY RUN] Would insert: id={post_id}, title='{title}', author='{author}'")
-                migrated += 1
-                continue
-            
-            # Add to batch
-            batch.add(prepared, (post_id, title, content, author, post_date))
+                    row = _row_to_params(doc, FALLBACK_DATE)
+                except Exception as e:
+                    print(f"Error converting post {doc.get('id')}: {e}")
+                    with progress_lock:
+                        read_errors += 1
+                    continue
+                yield row
+        except Exception as e:
+            print(f"Error reading posts from MongoDB: {e}")
+            read_failed = True
+    
+    if dry_run:
+        migrated = 0
+        for post_id, title, _, _, author, _ in params():
+            print(f"[DRY RUN] Would insert: id={post_id}, title='{title}', author='{author}'")
+            migrated += 1
+        return migrated, not (read_errors or read_failed)
+    
+    def advance(count):
+        nonlocal progress_done
+        with progress_lock:
+            before = progress_done
+            progress_done += count
+            if progress_done // PROGRESS_EVERY != before // PROGRESS_EVERY:
+                _report_progress(progress_done, total)
+    
+    def by_date_params(row):
+        post_id, title, _, content, author, post_date = row
+        return (post_date, post_id, title, content, author)
+    
+    # Rebuilt from scratch; see the docstring
+    cass_session.execute(f"TRUNCATE {keyspace}.posts_by_date")
+    
+    if batch_size:
+        # UNLOGGED skips the batchlog write. posts partitions on id, so its
+        # rows are grouped by the replica that owns them: a batch is routed
+        # by its first row, and the coordinator then holds every row locally
+        # instead of forwarding them to other nodes. posts_by_date rows all
+        # live in bucket 0, so they go in batches of their own that are
+        # single-partition and routed to that partition's replica.
+        batch_size = min(batch_size, MAX_BATCH_SIZE)
+        get_replicas = cass_session.cluster.metadata.get_replicas
+    
+    def write(rows):
+        """Write `rows` to Cassandra; returns (migrated, errors)."""
+        migrated = 0
+        errors = 0
+        # Rows that failed to bind; counted apart from `errors` because the
+        # driver runs batches() on its own thread
+        bind_errors = 0
+        
+        if batch_size:
+            # Sequence numbers of the posts in each batch, in send order;
+            # results come back in the same order
+            batch_posts = deque()
+            # Posts bound so far, and those with a failed posts or
+            # posts_by_date batch
+            sent = 0
+            failed = set()
             
-            # Execute batch when it reaches batch_size
-            if len(batch) >= batch_size:
-                cass_session.execute(batch)
-                batch.clear()
-                print(f"Progress: {migrated + 1}/{total} posts migrated...")
+            def batches():
+                # One open posts batch per primary replica and one
+                # posts_by_date batch, each as [batch, post seqs, bytes]. A
+                # batch is sent once it holds batch_size rows or the next
+                # row would take it past MAX_BATCH_BYTES.
+                nonlocal bind_errors, sent
+                pending = {}
+                by_date_batch = [BatchStatement(batch_type=BatchType.UNLOGGED), [], 0]
+                for row in rows:
+                    try:
+                        by_date_row = by_date_params(row)
+                        bound = prepared.bind(row)
+                        bound_by_date = by_date.bind(by_date_row)
+                    except Exception as e:
+                        bind_errors += 1
+                        print(f"Error migrating post {row[0]}: {e}")
+                        advance(1)
+                        continue
+                    seq = sent
+                    sent += 1
+                    replicas = get_replicas(keyspace, bound.routing_key)
+                    owner = replicas[0] if replicas else None
+                    
+                    size = _row_bytes(row)
+                    entry = pending.get(owner)
+                    if entry and (len(entry[1]) >= batch_size or entry[2] + size > MAX_BATCH_BYTES):
+                        batch_posts.append((True, entry[1]))
+                        yield (entry[0], None)
+                        entry = None
+                    if entry is None:
+                        entry = pending[owner] = [BatchStatement(batch_type=BatchType.UNLOGGED), [], 0]
+                    entry[0].add(bound)
+                    entry[1].append(seq)
+                    entry[2] += size
+                    
+                    size = _row_bytes(by_date_row)
+                    if by_date_batch[1] and (len(by_date_batch[1]) >= batch_size
+                                             or by_date_batch[2] + size > MAX_BATCH_BYTES):
+                        batch_posts.append((False, by_date_batch[1]))
+                        yield (by_date_batch[0], None)
+                        by_date_batch = [BatchStatement(batch_type=BatchType.UNLOGGED), [], 0]
+                    by_date_batch[0].add(bound_by_date)
+                    by_date_batch[1].append(seq)
+                    by_date_batch[2] += size
+                for batch, seqs, _ in list(pending.values()) + [by_date_batch]:
+                    if seqs:
+                        batch_posts.append((batch is not by_date_batch[0], seqs))
+                        yield (batch, None)
             
-            migrated += 1
+            results = execute_concurrent(
+                cass_session, batches(), concurrency=concurrency,
+                raise_on_first_error=False, results_generator=True
+            )
+            for success, result in results:
+                is_posts, seqs = batch_posts.popleft()
+                if not success:
+                    failed.update(seqs)
+                    table = 'posts' if is_posts else 'posts_by_date'
+                    print(f"Error migrating {table} batch of {len(seqs)} posts: {result}")
+                # Progress follows the posts batches; each post is in one
+                if is_posts:
+                    advance(len(seqs))
+            migrated = sent - len(failed)
+            errors = len(failed)
+        else:
+            def statements():
+                for row in rows:
+                    yield (prepared, row)
+                    yield (by_date, by_date_params(row))
             
-        except Exception as e:
-            errors += 1
-            print(f"Error migrating post (id={doc.get('id', 'unknown')}): {e}")
-            continue
+            # Results come back in send order: the posts insert of each post
+            # followed by its posts_by_date insert
+            results = iter(execute_concurrent(
+                cass_session, statements(), concurrency=concurrency,
+                raise_on_first_error=False, results_generator=True
+            ))
+            for (posts_ok, posts_result), (by_date_ok, by_date_result) in zip(results, results):
+                if posts_ok and by_date_ok:
+                    migrated += 1
+                else:
+                    errors += 1
+                    print(f"Error migrating post: {by_date_result if posts_ok else posts_result}")
+                advance(1)
+        
+        return migrated, errors + bind_errors
     
-    # Execute remaining batch
-    if not dry_run and len(batch) > 0:
-        try:
-            cass_session.execute(batch)
-        except Exception as e:
-            print(f"Error executing final batch: {e}")
+    if workers > 1 and not use_arrow:
+        # Each worker streams its own id range through a separate cursor.
+        # MongoClient and the Cassandra session are both thread-safe and
+        # pool their connections, so the workers share them.
+        # The catch-all slice picks up missing, null and non-numeric ids,
+        # which no numeric range matches
+        slices = [{'id': {'$not': {'$type': 'number'}}}] + [
+            {'id': {'$gte': lo, '$lt': hi}} for lo, hi in _id_ranges(posts_collection, workers)
+        ]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            totals = list(executor.map(lambda match: write(params(match)), slices))
+        migrated = sum(m for m, _ in totals)
+        errors = sum(e for _, e in totals)
+    else:
+        migrated, errors = write(params())
+    errors += read_errors
     
     print(f"\nMigration complete!")
-    print(f"Successfully migrated: {migrated}/{total} posts")
+    print(f"Successfully migrated: {migrated}/{migrated + errors} posts")
     if errors > 0:
         print(f"Errors encountered: {errors}")
     
-    return migrated
+    # The count is an estimate, but coming up short means rows were lost
+    complete = errors == 0 and not read_failed
+    if migrated + errors < total:
+        print(f"✗ Only {migrated + errors} of about {total} posts were read from MongoDB")
+        complete = False
+    
+    return migrated, complete
 
 
-def verify_migration(cass_session, keyspace, expected_count):
-    """Verify that migration was successful by counting records."""
+def rebuild_author_counts(mongo_db, cass_session, keyspace):
+    """
+    Bring the author_counts counter table in line with MongoDB.
+    
+    Counters can only be incremented, so each author's counter is moved by
+    the difference between its MongoDB post count and its current value
+    rather than truncated and refilled. Increments made by live dual writes
+    are kept, so this is safe in any phase that still writes MongoDB.
+    """
+    pipeline = [{"$group": {"_id": "$author", "count": {"$sum": 1}}}]
     try:
-        count_cql = f"SELECT COUNT(*) FROM {keyspace}.posts"
-        result = cass_session.execute(count_cql)
-        actual_count = result.one()[0]
+        expected = {}
+        for doc in mongo_db['posts'].aggregate(pipeline):
+            author = doc['_id'] or 'Anonymous'
+            expected[author] = expected.get(author, 0) + doc['count']
+        
+        select = cass_session.prepare(
+            f"SELECT count FROM {keyspace}.author_counts WHERE author = ?"
+        )
+        increment = cass_session.prepare(
+            f"UPDATE {keyspace}.author_counts SET count = count + ? WHERE author = ?"
+        )
+        # Authors counted in Cassandra but gone from MongoDB are moved to zero
+        authors = set(expected)
+        authors.update(
+            row.author for row in cass_session.execute(f"SELECT author FROM {keyspace}.author_counts")
+        )
+        for author in authors:
+            row = cass_session.execute(select, (author,)).one()
+            delta = expected.get(author, 0) - (row.count if row else 0)
+            if delta:
+                cass_session.execute(increment, (delta, author))
+        print("Author post counts rebuilt.")
+    except Exception as e:
+        print(f"Error rebuilding author counts: {e}")
+
+
+def verify_migration(mongo_db, cass_session, keyspace, sample_size=1000):
+    """
+    Verify the migration by spot-checking a random sample of posts.
+    
+    Samples posts in MongoDB with $sample and looks each one up in Cassandra
+    by partition key, instead of a SELECT COUNT(*) that scans the whole table.
+    """
+    try:
+        pipeline = [
+            {'$match': {'id': {'$ne': None}}},
+            {'$sample': {'size': sample_size}}
+        ] + POSTS_PIPELINE
+        sample = list(mongo_db['posts'].aggregate(pipeline))
+        
+        select_post = cass_session.prepare(
+            f"SELECT id, title, content, author FROM {keyspace}.posts WHERE id = ?"
+        )
+        results = execute_concurrent_with_args(
+            cass_session, select_post, [(post['id'],) for post in sample], concurrency=100
+        )
+        
+        missing = 0
+        mismatched = 0
+        for post, (_, rows) in zip(sample, results):
+            row = rows.one()
+            if row is None:
+                missing += 1
+            elif (row.title, row.content, row.author) != (post['title'], post['content'], post['author']):
+                mismatched += 1
         
         print(f"\nVerification:")
-        print(f"Expected posts: {expected_count}")
-        print(f"Actual posts in Cassandra: {actual_count}")
+        print(f"Sampled posts: {len(sample)}")
+        print(f"Missing in Cassandra: {missing}")
+        print(f"Mismatched fields: {mismatched}")
         
-        if actual_count == expected_count:
+        if missing == 0 and mismatched == 0:
             print("✓ Migration verified successfully!")
             return True
         else:
-            print("✗ Warning: Post count mismatch!")
+            print("✗ Warning: Sampled posts do not match!")
             return False
     except Exception as e:
         print(f"Error during verification: {e}")
         return False
 
 
+def _positive_int(value):
+    """argparse type for options that must be a whole number above zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {number}")
+    return number
+
+
 def parse_args():
     """Parse command line arguments."""
     p = argparse.ArgumentParser(
@@ -242,11 +637,33 @@ Examples:
         default=os.environ.get('CASS_KEYSPACE', 'blog_data'),
         help='Cassandra keyspace (default: blog_data)'
     )
+    p.add_argument(
+        '--concurrency',
+        type=_positive_int,
+        default=128,
+        help='Cassandra inserts kept in flight (default: 128)'
+    )
     p.add_argument(
         '--batch-size',
-        type=int,
-        default=50,
-        help='Batch size for Cassandra inserts (default: 50)'
+        type=_positive_int,
+        nargs='?',
+        const=MAX_BATCH_SIZE,
+        default=None,
+        help=f'Group inserts into UNLOGGED batches of this many rows '
+             f'(default when given without a value: {MAX_BATCH_SIZE}, max: {MAX_BATCH_SIZE}; '
+             f'batches are also capped at {MAX_BATCH_BYTES // 1024} KB)'
+    )
+    p.add_argument(
+        '--arrow',
+        action='store_true',
+        help='Read MongoDB into Arrow columns with pymongoarrow, if installed '
+             '(loads the collection into memory; string dates are treated as missing)'
+    )
+    p.add_argument(
+        '--workers',
+        type=_positive_int,
+        default=1,
+        help='Threads reading separate id ranges from MongoDB (default: 1)'
     )
     p.add_argument(
         '--dry-run',
@@ -258,6 +675,12 @@ Examples:
         action='store_true',
         help='Skip verification step after migration'
     )
+    p.add_argument(
+        '--verify-sample',
+        type=_positive_int,
+        default=1000,
+        help='Number of random posts to check after migration (default: 1000)'
+    )
     
     return p.parse_args()
 
@@ -278,7 +701,9 @@ def main():
     print(f"  Cassandra Hosts: {args.cass_hosts}")
     print(f"  Cassandra Port: {args.cass_port}")
     print(f"  Cassandra Keyspace: {args.cass_keyspace}")
-    print(f"  Batch Size: {args.batch_size}")
+    print(f"  Concurrency: {args.concurrency}")
+    print(f"  Batch Size: {args.batch_size or 'off (single-row inserts)'}")
+    print(f"  Workers: {args.workers}")
     print(f"  Dry Run: {args.dry_run}")
     print()
     
@@ -302,26 +727,37 @@ def main():
     # Migrate posts
     print("\nStarting migration...")
     print("-" * 60)
-    migrated_count = migrate_blog_posts(
+    migrated_count, complete = migrate_blog_posts(
         mongo_db,
         cass_session,
         args.cass_keyspace,
+        concurrency=args.concurrency,
+        dry_run=args.dry_run,
         batch_size=args.batch_size,
-        dry_run=args.dry_run
+        use_arrow=args.arrow,
+        workers=args.workers
     )
+    if not args.dry_run and migrated_count > 0:
+        rebuild_author_counts(mongo_db, cass_session, args.cass_keyspace)
     print("-" * 60)
     
     # Verify migration
     if not args.dry_run and not args.skip_verification and migrated_count > 0:
-        verify_migration(cass_session, args.cass_keyspace, migrated_count)
+        verify_migration(mongo_db, cass_session, args.cass_keyspace, args.verify_sample)
     
     # Cleanup
     cluster.shutdown()
     mongo.close()
     
     print("\n" + "=" * 60)
-    print("Migration process completed!")
+    if complete:
+        print("Migration process completed!")
+    else:
+        print("✗ Migration process completed with errors.")
     print("=" * 60)
+    
+    if not complete:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -15,13 +15,54 @@ Usage:
     python migration_controller.py migrate
     python migration_controller.py verify
     python migration_controller.py set-phase <phase>
+    python migration_controller.py rebuild-counts
     python migration_controller.py cleanup
 """
 
 import argparse
 import os
+import shutil
 import sys
+import tempfile
+from collections import deque
 from datetime import datetime
+from operator import itemgetter
+
+# Documents fetched from MongoDB per cursor round trip
+MONGO_BATCH_SIZE = 1000
+
+# Cassandra inserts kept in flight during a migration
+MAX_IN_FLIGHT = 256
+
+# Rows between progress lines
+PROGRESS_EVERY = 1000
+
+# Width of each id range deleted by `cleanup --keep-collection`
+DELETE_RANGE_SIZE = 10000
+
+# Values for post fields missing from a MongoDB document
+POST_DEFAULTS = {'id': 0, 'title': '', 'content': '', 'author': 'Anonymous'}
+
+# Date given to posts without one. Fixed rather than the time of the run, so
+# re-running the migration writes the same posts_by_date clustering key;
+# sorts undated posts last, as the app does.
+FALLBACK_DATE = datetime(1970, 1, 1)
+
+# Only the post fields the commands read; other fields are never sent or decoded
+POST_PROJECTION = {'_id': 0, 'id': 1, 'title': 1, 'content': 1, 'author': 1, 'Date': 1}
+_get_post_fields = itemgetter('id', 'title', 'content', 'author')
+
+
+def _chunks(iterable, size):
+    """Yield lists of up to `size` items from `iterable`."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
 
 def get_mongo_connection():
@@ -36,6 +77,74 @@ def get_mongo_connection():
     return client, client[db_name]
 
 
+# Prepared statements for the current session, keyed by CQL text
+_PREPARED = {}
+
+# Set once the keyspace and tables are known to exist
+_SCHEMA_READY = False
+
+
+def prepare(session, cql):
+    """Prepare `cql` once and reuse the statement on later calls."""
+    stmt = _PREPARED.get(cql)
+    if stmt is None:
+        stmt = _PREPARED[cql] = session.prepare(cql)
+    return stmt
+
+
+def _ensure_schema(cluster, session, keyspace):
+    """Create the keyspace and any tables missing from the cluster metadata."""
+    global _SCHEMA_READY
+    
+    if keyspace not in cluster.metadata.keyspaces:
+        session.execute(f"""
+            CREATE KEYSPACE IF NOT EXISTS {keyspace}
+            WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}
+        """)
+    session.set_keyspace(keyspace)
+    tables = cluster.metadata.keyspaces[keyspace].tables
+    
+    if 'posts' not in tables:
+        session.execute("""
+            CREATE TABLE IF NOT EXISTS posts (
+                id int PRIMARY KEY,
+                title text,
+                title_lower text,
+                content text,
+                author text,
+                date timestamp
+            )
+        """)
+    elif 'title_lower' not in tables['posts'].columns:
+        # Tables created before title_lower existed need the column added
+        session.execute("ALTER TABLE posts ADD title_lower text")
+    
+    # Per-author counter table
+    if 'author_counts' not in tables:
+        session.execute("""
+            CREATE TABLE IF NOT EXISTS author_counts (
+                author text PRIMARY KEY,
+                count counter
+            )
+        """)
+    
+    # Date-clustered copy used for streaming reads
+    if 'posts_by_date' not in tables:
+        session.execute("""
+            CREATE TABLE IF NOT EXISTS posts_by_date (
+                bucket int,
+                date timestamp,
+                id int,
+                title text,
+                content text,
+                author text,
+                PRIMARY KEY (bucket, date, id)
+            ) WITH CLUSTERING ORDER BY (date DESC, id DESC)
+        """)
+    
+    _SCHEMA_READY = True
+
+
 def get_cassandra_connection():
     """Get Cassandra connection."""
     from cassandra.cluster import Cluster
@@ -47,28 +156,176 @@ def get_cassandra_connection():
     cluster = Cluster(hosts, port=port)
     session = cluster.connect()
     
-    # Ensure keyspace exists
-    session.execute(f"""
-        CREATE KEYSPACE IF NOT EXISTS {keyspace}
-        WITH replication = {{'class': 'SimpleStrategy', 'replication_factor': 1}}
-    """)
+    # The driver loads the schema metadata on connect, so only the parts
+    # that are actually missing need a DDL round trip
+    if not _SCHEMA_READY:
+        _ensure_schema(cluster, session, keyspace)
     session.set_keyspace(keyspace)
     
-    # Ensure table exists
-    session.execute("""
-        CREATE TABLE IF NOT EXISTS posts (
-            id int PRIMARY KEY,
-            title text,
-            content text,
-            author text,
-            date timestamp
-        )
+    # Statements prepared on an earlier session can't be reused
+    _PREPARED.clear()
+    return cluster, session
+
+
+class Connections:
+    """
+    MongoDB and Cassandra connections shared by the commands of one run.
+    
+    Each side connects on first use, so commands that only touch one
+    database never open the other. Both are closed when the context exits.
+    """
+    
+    def __init__(self):
+        self._mongo = None
+        self._cassandra = None
+    
+    @property
+    def mongo(self):
+        """(client, db) for MongoDB."""
+        if self._mongo is None:
+            self._mongo = get_mongo_connection()
+        return self._mongo
+    
+    @property
+    def cassandra(self):
+        """(cluster, session) for Cassandra."""
+        if self._cassandra is None or self._cassandra[0].is_shutdown:
+            self._cassandra = get_cassandra_connection()
+        return self._cassandra
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._mongo is not None:
+            self._mongo[0].close()
+        if self._cassandra is not None:
+            self._cassandra[0].shutdown()
+        return False
+
+
+def rebuild_author_counts(mongo_db, session):
+    """
+    Bring the Cassandra author_counts table in line with MongoDB.
+    
+    Counters can only be incremented, so each author's counter is moved by
+    the difference between its MongoDB post count and its current value
+    rather than truncated and refilled. Increments made by live dual writes
+    are kept, so this is safe in any phase that still writes MongoDB. A
+    post added while it runs can leave its author off by one; run it again
+    once /api/migration/lag reports 0.
+    
+    Returns the number of authors whose count was corrected.
+    """
+    pipeline = [{"$group": {"_id": "$author", "count": {"$sum": 1}}}]
+    
+    expected = {}
+    for doc in mongo_db['posts'].aggregate(pipeline):
+        author = doc['_id'] or 'Anonymous'
+        expected[author] = expected.get(author, 0) + doc['count']
+    
+    select = prepare(session, "SELECT count FROM author_counts WHERE author = ?")
+    increment = prepare(
+        session, "UPDATE author_counts SET count = count + ? WHERE author = ?"
+    )
+    # Authors counted in Cassandra but gone from MongoDB are moved to zero
+    authors = set(expected)
+    authors.update(row.author for row in session.execute("SELECT author FROM author_counts"))
+    
+    corrected = 0
+    for author in authors:
+        # Read each counter just before correcting it, so the window for a
+        # concurrent increment to slip in is one round trip
+        row = session.execute(select, (author,)).one()
+        delta = expected.get(author, 0) - (row.count if row else 0)
+        if delta:
+            session.execute(increment, (delta, author))
+            corrected += 1
+    return corrected
+
+
+def bulk_insert_posts(session, posts, total=None):
+    """
+    Insert MongoDB post documents that already have IDs into Cassandra.
+    
+    Each post is written to posts and posts_by_date with single-row inserts
+    (every post is its own partition, so a BATCH gains nothing). Up to
+    MAX_IN_FLIGHT are outstanding; once the window is full the oldest is
+    waited on before sending another. Author counts are counters and are
+    left alone; rebuild them afterwards.
+    
+    Returns (migrated, errors).
+    """
+    insert_post = prepare(session, """
+        INSERT INTO posts (id, title, title_lower, content, author, date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """)
+    insert_by_date = prepare(session, """
+        INSERT INTO posts_by_date (bucket, date, id, title, content, author)
+        VALUES (0, ?, ?, ?, ?, ?)
     """)
     
-    return cluster, session
+    inflight = deque()
+    migrated = 0
+    errors = 0
+    # Posts done when the last progress line was printed
+    last_report = 0
+    
+    def report_progress():
+        nonlocal last_report
+        done = migrated + errors
+        if done - last_report >= PROGRESS_EVERY:
+            last_report = done
+            sys.stdout.write(f"  Progress: {done}/{total} posts...\n")
+            sys.stdout.flush()
+    
+    def wait_oldest():
+        nonlocal migrated, errors
+        post_id, futures = inflight.popleft()
+        try:
+            for future in futures:
+                future.result()
+            migrated += 1
+        except Exception as e:
+            errors += 1
+            print(f"  ✗ Error migrating post {post_id}: {e}")
+        report_progress()
+    
+    try:
+        for post in posts:
+            try:
+                post_id, title, content, author = _get_post_fields({**POST_DEFAULTS, **post})
+                date = post.get('Date') or FALLBACK_DATE
+                
+                if isinstance(date, str):
+                    date = datetime.fromisoformat(date)
+                
+                futures = (
+                    session.execute_async(
+                        insert_post, (post_id, title, str(title or '').lower(), content, author, date)
+                    ),
+                    session.execute_async(
+                        insert_by_date, (date, post_id, title, content, author)
+                    )
+                )
+            except Exception as e:
+                errors += 1
+                print(f"  ✗ Error migrating post {post.get('id')}: {e}")
+                report_progress()
+                continue
+            
+            inflight.append((post_id, futures))
+            if len(inflight) >= MAX_IN_FLIGHT:
+                wait_oldest()
+    finally:
+        # Inserts already sent are waited on even if reading MongoDB fails
+        while inflight:
+            wait_oldest()
+    
+    return migrated, errors
 
 
-def cmd_status(args):
+def cmd_status(args, conns):
     """Show current migration status."""
     print("\n" + "=" * 60)
     print("MIGRATION STATUS")
@@ -80,25 +337,24 @@ def cmd_status(args):
     # Check MongoDB
     print("\n--- MongoDB ---")
     try:
-        client, db = get_mongo_connection()
+        client, db = conns.mongo
         posts = db['posts']
-        count = posts.count_documents({})
+        count = posts.estimated_document_count()
         print(f"✓ Connected")
-        print(f"  Posts count: {count}")
+        print(f"  Posts count: ~{count}")
         
         # Show sample
         sample = posts.find_one({}, {'_id': 0})
         if sample:
             print(f"  Sample post: ID={sample.get('id')}, Title='{sample.get('title', '')[:30]}...'")
-        client.close()
     except Exception as e:
         print(f"✗ Connection failed: {e}")
     
     # Check Cassandra
     print("\n--- Cassandra ---")
     try:
-        cluster, session = get_cassandra_connection()
-        result = session.execute("SELECT COUNT(*) FROM posts")
+        cluster, session = conns.cassandra
+        result = session.execute(prepare(session, "SELECT COUNT(*) FROM posts"))
         count = result.one()[0]
         print(f"✓ Connected")
         print(f"  Posts count: {count}")
@@ -108,7 +364,6 @@ def cmd_status(args):
         row = sample.one()
         if row:
             print(f"  Sample post: ID={row.id}, Title='{row.title[:30] if row.title else ''}...'")
-        cluster.shutdown()
     except Exception as e:
         print(f"✗ Connection failed: {e}")
     
@@ -127,7 +382,7 @@ def cmd_status(args):
     print("=" * 60 + "\n")
 
 
-def cmd_migrate(args):
+def cmd_migrate(args, conns):
     """Run the initial data migration from MongoDB to Cassandra."""
     print("\n" + "=" * 60)
     print("MIGRATING DATA: MongoDB → Cassandra")
@@ -136,77 +391,54 @@ def cmd_migrate(args):
     try:
         # Connect to both databases
         print("\nConnecting to databases...")
-        mongo_client, mongo_db = get_mongo_connection()
+        mongo_client, mongo_db = conns.mongo
         print("✓ MongoDB connected")
         
-        cass_cluster, cass_session = get_cassandra_connection()
+        cass_cluster, cass_session = conns.cassandra
         print("✓ Cassandra connected")
         
-        # Get posts from MongoDB
+        # Metadata estimate for progress output; the cursor is streamed below
         posts_collection = mongo_db['posts']
-        mongo_posts = list(posts_collection.find({}, {'_id': 0}))
-        total = len(mongo_posts)
+        total = posts_collection.estimated_document_count()
         
         if total == 0:
             print("\nNo posts found in MongoDB. Nothing to migrate.")
             return
         
-        print(f"\nFound {total} posts to migrate.")
+        print(f"\nFound about {total} posts to migrate.")
         
         if args.dry_run:
             print("\n[DRY RUN] Would migrate the following posts:")
-            for post in mongo_posts:
+            cursor = posts_collection.find({}, POST_PROJECTION).batch_size(MONGO_BATCH_SIZE)
+            for post in cursor:
                 print(f"  - ID={post.get('id')}: {post.get('title', 'Untitled')}")
             return
         
-        # Prepare insert statement
-        insert_query = """
-            INSERT INTO posts (id, title, content, author, date)
-            VALUES (?, ?, ?, ?, ?)
-        """
-        prepared = cass_session.prepare(insert_query)
-        
-        # Migrate each post
-        migrated = 0
-        errors = 0
+        # Rebuilt from the same rows as posts, so a re-run leaves nothing
+        # behind for posts whose date changed. Run this before the app
+        # starts dual writes, or posts it writes there are lost.
+        cass_session.execute("TRUNCATE posts_by_date")
         
         print("\nMigrating posts...")
-        for post in mongo_posts:
-            try:
-                post_id = post.get('id', 0)
-                title = post.get('title', '')
-                content = post.get('content', '')
-                author = post.get('author', 'Anonymous')
-                date = post.get('Date', datetime.now())
-                
-                if isinstance(date, str):
-                    date = datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
-                
-                cass_session.execute(prepared, (post_id, title, content, author, date))
-                migrated += 1
-                print(f"  ✓ Migrated post {post_id}: {title[:40]}...")
-                
-            except Exception as e:
-                errors += 1
-                print(f"  ✗ Error migrating post {post.get('id')}: {e}")
+        cursor = posts_collection.find({}, POST_PROJECTION).batch_size(MONGO_BATCH_SIZE)
+        migrated, errors = bulk_insert_posts(cass_session, cursor, total)
+        
+        rebuild_author_counts(mongo_db, cass_session)
+        print("  ✓ Rebuilt author post counts")
         
         print("\n" + "-" * 60)
         print(f"Migration complete!")
-        print(f"  Successfully migrated: {migrated}/{total}")
+        print(f"  Successfully migrated: {migrated}/{migrated + errors}")
         if errors > 0:
             print(f"  Errors: {errors}")
         
-        # Cleanup
-        mongo_client.close()
-        cass_cluster.shutdown()
-        
     except Exception as e:
         print(f"\n✗ Migration failed: {e}")
         import traceback
         traceback.print_exc()
 
 
-def cmd_verify(args):
+def cmd_verify(args, conns):
     """Verify data integrity between MongoDB and Cassandra."""
     print("\n" + "=" * 60)
     print("VERIFYING DATA INTEGRITY")
@@ -214,73 +446,109 @@ def cmd_verify(args):
     
     try:
         # Connect to both databases
-        mongo_client, mongo_db = get_mongo_connection()
-        cass_cluster, cass_session = get_cassandra_connection()
+        mongo_client, mongo_db = conns.mongo
+        cass_cluster, cass_session = conns.cassandra
         
         posts_collection = mongo_db['posts']
         
-        # Compare counts
-        mongo_count = posts_collection.count_documents({})
-        cass_result = cass_session.execute("SELECT COUNT(*) FROM posts")
-        cass_count = cass_result.one()[0]
-        
-        print(f"\n--- Record Counts ---")
-        print(f"MongoDB:   {mongo_count}")
-        print(f"Cassandra: {cass_count}")
-        
-        if mongo_count == cass_count:
-            print("✓ Counts match!")
-        else:
-            print("✗ Count mismatch!")
-        
         # Compare individual records
         print(f"\n--- Data Comparison ---")
         
-        mongo_posts = {p['id']: p for p in posts_collection.find({}, {'_id': 0})}
-        
-        cass_posts = {}
-        for row in cass_session.execute("SELECT id, title, content, author, date FROM posts"):
-            cass_posts[row.id] = {
-                'id': row.id,
-                'title': row.title,
-                'content': row.content,
-                'author': row.author,
-                'Date': row.date
-            }
-        
-        all_ids = set(mongo_posts.keys()) | set(cass_posts.keys())
+        from cassandra.concurrent import execute_concurrent_with_args
+        from cassandra.query import SimpleStatement
         
         matches = 0
         mismatches = 0
+        mongo_count = 0
+        cass_count = 0
+        
+        # MongoDB → Cassandra: walk MongoDB in ID order a chunk at a time (or
+        # a random sample of it) and look each post up in Cassandra by
+        # partition key
+        select_post = prepare(
+            cass_session, "SELECT id, title, content, author FROM posts WHERE id = ?"
+        )
+        fields = {'_id': 0, 'id': 1, 'title': 1, 'content': 1, 'author': 1}
+        if args.sample:
+            cursor = posts_collection.aggregate([
+                {'$sample': {'size': args.sample}},
+                {'$project': fields}
+            ])
+        else:
+            cursor = posts_collection.find({}, fields).sort('id', 1).batch_size(MONGO_BATCH_SIZE)
         
-        for post_id in sorted(all_ids):
-            mongo_post = mongo_posts.get(post_id)
-            cass_post = cass_posts.get(post_id)
+        for chunk in _chunks(cursor, MONGO_BATCH_SIZE):
+            mongo_count += len(chunk)
             
-            if not mongo_post:
-                print(f"  ✗ Post {post_id}: Missing in MongoDB")
-                mismatches += 1
-                continue
+            # A post without an id can't be looked up by partition key
+            keyed = []
+            for mongo_post in chunk:
+                if mongo_post.get('id') is None:
+                    print(f"  ✗ Post without an id in MongoDB: {mongo_post.get('title')!r}")
+                    mismatches += 1
+                else:
+                    keyed.append(mongo_post)
             
-            if not cass_post:
-                print(f"  ✗ Post {post_id}: Missing in Cassandra")
-                mismatches += 1
-                continue
+            # A failed lookup counts against its own post instead of ending the run
+            results = execute_concurrent_with_args(
+                cass_session, select_post, [(p['id'],) for p in keyed],
+                concurrency=100, raise_on_first_error=False
+            )
+            for mongo_post, (success, rows) in zip(keyed, results):
+                post_id = mongo_post['id']
+                if not success:
+                    print(f"  ✗ Post {post_id}: Lookup in Cassandra failed: {rows}")
+                    mismatches += 1
+                    continue
+                cass_post = rows.one()
+                
+                if cass_post is None:
+                    print(f"  ✗ Post {post_id}: Missing in Cassandra")
+                    mismatches += 1
+                    continue
+                
+                # Compare fields
+                issues = []
+                if mongo_post.get('title') != cass_post.title:
+                    issues.append("title")
+                if mongo_post.get('content') != cass_post.content:
+                    issues.append("content")
+                if mongo_post.get('author') != cass_post.author:
+                    issues.append("author")
+                
+                if issues:
+                    print(f"  ✗ Post {post_id}: Mismatch in {', '.join(issues)}")
+                    mismatches += 1
+                else:
+                    matches += 1
+        
+        # Cassandra → MongoDB: page through the Cassandra IDs and check each
+        # page against MongoDB with one $in query. This pass also yields the
+        # Cassandra row count, so no separate SELECT COUNT(*) scan is needed.
+        if not args.sample:
+            ids_query = SimpleStatement("SELECT id FROM posts", fetch_size=MONGO_BATCH_SIZE)
+            cass_ids = (row.id for row in cass_session.execute(ids_query))
             
-            # Compare fields
-            issues = []
-            if mongo_post.get('title') != cass_post.get('title'):
-                issues.append("title")
-            if mongo_post.get('content') != cass_post.get('content'):
-                issues.append("content")
-            if mongo_post.get('author') != cass_post.get('author'):
-                issues.append("author")
+            for chunk in _chunks(cass_ids, MONGO_BATCH_SIZE):
+                cass_count += len(chunk)
+                found = {
+                    p['id'] for p in posts_collection.find({'id': {'$in': chunk}}, {'_id': 0, 'id': 1})
+                }
+                for post_id in chunk:
+                    if post_id not in found:
+                        print(f"  ✗ Post {post_id}: Missing in MongoDB")
+                        mismatches += 1
             
-            if issues:
-                print(f"  ✗ Post {post_id}: Mismatch in {', '.join(issues)}")
-                mismatches += 1
+            print(f"\n--- Record Counts ---")
+            print(f"MongoDB:   {mongo_count}")
+            print(f"Cassandra: {cass_count}")
+            
+            if mongo_count == cass_count:
+                print("✓ Counts match!")
             else:
-                matches += 1
+                print("✗ Count mismatch!")
+        else:
+            print(f"\nChecked a random sample of {mongo_count} MongoDB posts")
         
         print(f"\n--- Summary ---")
         print(f"Matching posts: {matches}")
@@ -291,17 +559,13 @@ def cmd_verify(args):
         else:
             print("\n✗ Data integrity issues found!")
         
-        # Cleanup
-        mongo_client.close()
-        cass_cluster.shutdown()
-        
     except Exception as e:
         print(f"\n✗ Verification failed: {e}")
         import traceback
         traceback.print_exc()
 
 
-def cmd_set_phase(args):
+def cmd_set_phase(args, conns):
     """Set the migration phase."""
     valid_phases = ['mongo_only', 'dual_write', 'read_cassandra', 'cassandra_only']
     
@@ -317,19 +581,37 @@ def cmd_set_phase(args):
     # Create/update .env file
     env_file = os.path.join(os.path.dirname(__file__), '.env')
     
-    env_vars = {}
+    lines = []
     if os.path.exists(env_file):
         with open(env_file, 'r') as f:
-            for line in f:
-                if '=' in line and not line.startswith('#'):
-                    key, value = line.strip().split('=', 1)
-                    env_vars[key] = value
-    
-    env_vars['MIGRATION_PHASE'] = args.phase
-    
-    with open(env_file, 'w') as f:
-        for key, value in env_vars.items():
-            f.write(f"{key}={value}\n")
+            lines = f.readlines()
+    
+    # Rewrite only the phase line; comments, order and other keys stay as-is
+    phase_line = f"MIGRATION_PHASE={args.phase}\n"
+    replaced = False
+    for i, line in enumerate(lines):
+        if line.startswith('MIGRATION_PHASE='):
+            lines[i] = phase_line
+            replaced = True
+    
+    if not replaced:
+        if lines and not lines[-1].endswith('\n'):
+            lines[-1] += '\n'
+        lines.append(phase_line)
+    
+    # Write to a temporary file and swap it in so the .env is never half-written.
+    # A symlinked .env is updated at its target, and the file keeps its mode.
+    real_path = os.path.realpath(env_file)
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(real_path), prefix='.env.')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.writelines(lines)
+        if os.path.exists(real_path):
+            shutil.copymode(real_path, tmp_file)
+        os.replace(tmp_file, real_path)
+    except BaseException:
+        os.unlink(tmp_file)
+        raise
     
     print(f"\n✓ Updated .env file with MIGRATION_PHASE={args.phase}")
     print("\nTo apply the change:")
@@ -349,7 +631,23 @@ def cmd_set_phase(args):
     print("=" * 60 + "\n")
 
 
-def cmd_cleanup(args):
+def cmd_rebuild_counts(args, conns):
+    """Correct Cassandra author post counts from MongoDB."""
+    print("\n" + "=" * 60)
+    print("REBUILDING AUTHOR COUNTS")
+    print("=" * 60)
+    
+    try:
+        _, mongo_db = conns.mongo
+        _, cass_session = conns.cassandra
+        corrected = rebuild_author_counts(mongo_db, cass_session)
+        print(f"✓ Corrected {corrected} author counts")
+    except Exception as e:
+        print(f"✗ Rebuild failed: {e}")
+        sys.exit(1)
+
+
+def cmd_cleanup(args, conns):
     """Remove MongoDB data after migration is complete."""
     print("\n" + "=" * 60)
     print("CLEANUP: Removing MongoDB Data")
@@ -367,11 +665,11 @@ def cmd_cleanup(args):
             return
     
     try:
-        mongo_client, mongo_db = get_mongo_connection()
+        mongo_client, mongo_db = conns.mongo
         posts_collection = mongo_db['posts']
         
-        count = posts_collection.count_documents({})
-        print(f"\nFound {count} posts in MongoDB to delete.")
+        count = posts_collection.estimated_document_count()
+        print(f"\nFound about {count} posts in MongoDB to delete.")
         
         if args.dry_run:
             print("\n[DRY RUN] Would delete all posts from MongoDB")
@@ -382,16 +680,26 @@ def cmd_cleanup(args):
             print("Cleanup cancelled.")
             return
         
-        # Delete all posts
-        result = posts_collection.delete_many({})
-        print(f"\n✓ Deleted {result.deleted_count} posts from MongoDB")
-        
-        # Optionally drop the collection
-        if args.drop_collection:
+        if not args.keep_collection:
+            # Dropping is a metadata operation, unlike deleting every document
             mongo_db.drop_collection('posts')
-            print("✓ Dropped 'posts' collection")
-        
-        mongo_client.close()
+            print("\n✓ Dropped 'posts' collection")
+        else:
+            # Delete in id ranges so no single operation runs for long
+            deleted = 0
+            lowest = posts_collection.find_one({'id': {'$type': 'number'}}, sort=[('id', 1)])
+            highest = posts_collection.find_one({'id': {'$type': 'number'}}, sort=[('id', -1)])
+            if lowest and highest:
+                for lo in range(int(lowest['id']), int(highest['id']) + 1, DELETE_RANGE_SIZE):
+                    result = posts_collection.delete_many(
+                        {'id': {'$gte': lo, '$lt': lo + DELETE_RANGE_SIZE}}
+                    )
+                    deleted += result.deleted_count
+            
+            # Posts without a numeric id are not covered by the ranges
+            result = posts_collection.delete_many({'id': {'$not': {'$type': 'number'}}})
+            deleted += result.deleted_count
+            print(f"\n✓ Deleted {deleted} posts from MongoDB")
         
         print("\n" + "-" * 60)
         print("Cleanup complete!")
@@ -403,6 +711,17 @@ def cmd_cleanup(args):
         print(f"\n✗ Cleanup failed: {e}")
 
 
+def _positive_int(value):
+    """argparse type for options that must be a whole number above zero."""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid int value: {value!r}")
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {number}")
+    return number
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="MongoDB to Cassandra Migration Controller",
@@ -431,6 +750,8 @@ Migration Workflow:
     
     # Verify command
     verify_parser = subparsers.add_parser('verify', help='Verify data integrity')
+    verify_parser.add_argument('--sample', type=_positive_int, metavar='N',
+                               help='Only check N random MongoDB posts in Cassandra')
     
     # Set phase command
     phase_parser = subparsers.add_parser('set-phase', help='Set migration phase')
@@ -438,29 +759,38 @@ Migration Workflow:
                               choices=['mongo_only', 'dual_write', 'read_cassandra', 'cassandra_only'],
                               help='Migration phase to set')
     
+    # Rebuild counts command
+    subparsers.add_parser('rebuild-counts',
+                          help='Correct Cassandra author post counts from MongoDB')
+    
     # Cleanup command
     cleanup_parser = subparsers.add_parser('cleanup', help='Remove MongoDB data')
     cleanup_parser.add_argument('--dry-run', action='store_true',
                                 help='Show what would be deleted without deleting')
     cleanup_parser.add_argument('--force', action='store_true',
                                 help='Force cleanup even if not in cassandra_only phase')
+    cleanup_parser.add_argument('--keep-collection', action='store_true',
+                                help='Delete the posts but keep the collection and its indexes')
     cleanup_parser.add_argument('--drop-collection', action='store_true',
-                                help='Also drop the posts collection')
+                                help='Drop the posts collection (the default; kept for compatibility)')
     
     args = parser.parse_args()
     
-    if args.command == 'status':
-        cmd_status(args)
-    elif args.command == 'migrate':
-        cmd_migrate(args)
-    elif args.command == 'verify':
-        cmd_verify(args)
-    elif args.command == 'set-phase':
-        cmd_set_phase(args)
-    elif args.command == 'cleanup':
-        cmd_cleanup(args)
-    else:
-        parser.print_help()
+    with Connections() as conns:
+        if args.command == 'status':
+            cmd_status(args, conns)
+        elif args.command == 'migrate':
+            cmd_migrate(args, conns)
+        elif args.command == 'verify':
+            cmd_verify(args, conns)
+        elif args.command == 'set-phase':
+            cmd_set_phase(args, conns)
+        elif args.command == 'rebuild-counts':
+            cmd_rebuild_counts(args, conns)
+        elif args.command == 'cleanup':
+            cmd_cleanup(args, conns)
+        else:
+            parser.print_help()
 
 
 if __name__ == '__main__':